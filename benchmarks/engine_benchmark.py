@@ -0,0 +1,180 @@
+# Times the engine hot paths against the shipped assets and synthetic worlds of growing size.
+# Results are written as JSON so two runs can be compared:
+#   python benchmarks/engine_benchmark.py --output before.json
+#   python benchmarks/engine_benchmark.py --compare before.json
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_assets import GameAssets
+from game_bundle import load_game_data
+from game_generator import DIRECTIONS, TOPOLOGIES, WorldGenerator
+from game_session import GameSessionManager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+assets_file_name = os.path.join(ROOT, 'game_assets.json')
+commands_file_name = os.path.join(ROOT, 'game_command_map.json')
+responses_file_name = os.path.join(ROOT, 'game_responses.json')
+
+# where each action family is exercised in the shipped world
+SHIPPED_FIXTURE = {
+    'start_room' : 'Room 1',
+    'move' : ('Room 1', {'Room 1':'free'}, 'n', 's'),
+    'pickup_drop' : ('Room 7', 'knife'),
+    'open' : ('Room 4', 'open chest', {'chest':'free', 'hourglass':'hidden'}),
+    'attack' : ('Room 5', 'attack barrier', {'barrier':'free', 'Room 5':'init'})}
+
+def get_synthetic_fixture(generator) -> dict:
+    first = generator.get_start_room_name()
+    last = generator.get_room_name(generator.get_room_count() - 1)
+    forward = next(iter(generator.get_room_connections(0)), None)
+    return {
+        'start_room' : first,
+        'move' : (first, {}, forward, DIRECTIONS.get(forward)),
+        'pickup_drop' : (last, f"prop_{generator.get_room_count() - 1}_0"),
+        'open' : (last, f"open chest_{generator.get_room_count() - 1}", {f"chest_{generator.get_room_count() - 1}":'free', last:'init'}),
+        'attack' : (last, f"attack barrier_{generator.get_room_count() - 1}", {f"barrier_{generator.get_room_count() - 1}":'free', last:'init'})}
+
+def place_player(model, room_name:str) -> None:
+    player_name = model.get_player_name()
+    player = model.get_characters().get(player_name)
+    model.get_rooms().get(player.get_room_name()).remove_game_objects(player_name)
+    player.set_room_name(room_name)
+    model.get_rooms().get(room_name).set_game_objects({player_name:player})
+
+def reset_states(model, states:dict) -> None:
+    for name, state in states.items():
+        model.get_world_objects().get(name).set_current_state(state)
+
+def time_calls(func, iterations:int, setup=None) -> list:
+    # per-call wall times in seconds; setup runs untimed before every call
+    timings = []
+    for idx in range(iterations):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def summarise(world:str, benchmark:str, timings:list) -> dict:
+    return {
+        'world' : world,
+        'benchmark' : benchmark,
+        'iterations' : len(timings),
+        'mean_us' : statistics.fmean(timings) * 1e6,
+        'median_us' : statistics.median(timings) * 1e6,
+        'min_us' : min(timings) * 1e6}
+
+def run_world(world:str, data:dict, commands:dict, responses:dict, fixture:dict, iterations:int) -> list:
+    results = []
+    assets = GameAssets(data, commands, responses)
+    manager = GameSessionManager(assets, headless=True)
+
+    # construction of a whole session, dominated by GameModel
+    construction = max(3, min(iterations, 200000 // max(1, len(data['world_objects']['game_objects']))))
+    results.append(summarise(world, 'GameModel', time_calls(
+        lambda: manager.destroy_session(manager.create_session('bench').get_session_id()), construction)))
+
+    session = manager.create_session()
+    ctrl = session.get_controller()
+    model = session.get_model()
+    rules = model.get_action_rules()
+
+    results.append(summarise(world, 'parse_command', time_calls(lambda: ctrl.parse_command('look'), iterations)))
+
+    place_player(model, fixture['start_room'])
+    results.append(summarise(world, 'try_parse.describe', time_calls(lambda: ctrl.try_parse('look'), iterations)))
+
+    room_name, room_states, forward, back = fixture['move']
+    place_player(model, room_name)
+    reset_states(model, room_states)
+    results.append(summarise(world, 'try_parse.move', time_calls(
+        lambda: (ctrl.try_parse(forward), ctrl.try_parse(back)), iterations)))
+
+    room_name, item_name = fixture['pickup_drop']
+    place_player(model, room_name)
+    results.append(summarise(world, 'try_parse.pickup_drop', time_calls(
+        lambda: (ctrl.try_parse(f"get {item_name}"), ctrl.try_parse(f"drop {item_name}")), iterations)))
+
+    for family in ['open', 'attack']:
+        room_name, command, reset = fixture[family]
+        place_player(model, room_name)
+        results.append(summarise(world, f"try_parse.{family}", time_calls(
+            lambda: ctrl.try_parse(command), iterations, lambda: reset_states(model, reset))))
+
+    describe = rules.get_rule('describe', fixture['start_room'])
+    place_player(model, fixture['start_room'])
+    results.append(summarise(world, 'describe_free_objects', time_calls(lambda: ctrl.describe_free_objects(describe), iterations)))
+    results.append(summarise(world, 'describe_room_connections', time_calls(lambda: ctrl.describe_room_connections(describe), iterations)))
+    return results
+
+def get_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(previous:dict, current:dict, threshold:float) -> list:
+    # benchmarks whose median got slower than the threshold allows, as readable lines
+    old = {(x['world'], x['benchmark']):x for x in previous['results']}
+    regressions = []
+    for result in current['results']:
+        before = old.get((result['world'], result['benchmark']))
+        if before is not None and result['median_us'] > before['median_us'] * (1 + threshold):
+            regressions.append(f"{result['world']} {result['benchmark']}: "
+                f"{before['median_us']:.2f}us -> {result['median_us']:.2f}us")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the game engine hot paths.')
+    parser.add_argument('--iterations', type=int, default=2000, help='timed calls per benchmark')
+    parser.add_argument('--sizes', default='10,100,1000', help='comma separated room counts for synthetic worlds')
+    parser.add_argument('--objects-per-room', type=int, default=10)
+    parser.add_argument('--topology', choices=TOPOLOGIES, default='corridor', help='room layout of the synthetic worlds')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the synthetic worlds')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('--compare', help='previous JSON results; exit with status 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative slowdown when comparing')
+    args = parser.parse_args()
+
+    results = []
+    data, commands, responses = load_game_data(assets_file_name, commands_file_name, responses_file_name)
+    results += run_world('shipped', data, commands, responses, SHIPPED_FIXTURE, args.iterations)
+    for room_count in [int(x) for x in args.sizes.split(',') if x]:
+        generator = WorldGenerator(args.seed, room_count, args.topology, args.objects_per_room)
+        data, commands = generator.build()
+        # corridor worlds keep the original label so older result files still compare
+        label = 'synthetic' if args.topology == 'corridor' else f"synthetic-{args.topology}"
+        results += run_world(f"{label}-{room_count}x{args.objects_per_room}", data, commands, responses,
+            get_synthetic_fixture(generator), args.iterations)
+
+    report = {
+        'commit' : get_commit(),
+        'python' : platform.python_version(),
+        'iterations' : args.iterations,
+        'results' : results}
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as compare_file:
+            regressions = compare(json.load(compare_file), report, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if len(regressions) > 0:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
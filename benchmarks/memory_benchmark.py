@@ -0,0 +1,66 @@
+# Measures bytes per world object and bytes per game session with tracemalloc.
+# Run from the repository root:  python benchmarks/memory_benchmark.py [--count N]
+import argparse
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_assets import GameAssets
+from game_bundle import load_game_data
+from game_classes import *
+from game_session import GameSessionManager
+
+assets_file_name = 'game_assets.json'
+commands_file_name = 'game_command_map.json'
+responses_file_name = 'game_responses.json'
+
+def measure(factory, count:int) -> float:
+    # average traced bytes retained per object created by factory
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [factory(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # the list holding the objects is not part of the object cost
+    return (after - before - sys.getsizeof(kept)) / count
+
+def measure_objects(assets, count:int) -> dict:
+    game_objects = assets.get_data()['world_objects']['game_objects']
+    rooms = assets.get_data()['world_objects']['rooms']
+    player = game_objects['player']
+    knife = game_objects['knife']
+    room = rooms['Room 1']
+    rule = assets.get_data()['actions']['pickup']['knife']
+    return {
+        'Character' : measure(lambda i: Character(
+            'player', player['state'], player['starting_room'], player['starting_state'], player['is_playable']), count),
+        'Item' : measure(lambda i: Item(
+            'knife', knife['state'], knife['starting_room'], knife['starting_state'], knife['is_carryable'], knife['is_equippable']), count),
+        'Room' : measure(lambda i: Room('Room 1', room['state'], room['starting_state']), count),
+        'ActionRule' : measure(lambda i: ActionRule(
+            'pickup', 'knife', rule['req_state'], rule['next_state'], rule['description_success']), count)}
+
+def measure_sessions(assets, count:int) -> dict:
+    manager = GameSessionManager(assets)
+    def new_session(i):
+        session = manager.create_session(str(i))
+        session.try_parse('pickup book')
+        session.try_parse('n')
+        return session
+    return {'session' : measure(new_session, count)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Report bytes per world object and per game session.')
+    parser.add_argument('--count', type=int, default=1000, help='instances created per measurement')
+    args = parser.parse_args()
+
+    assets = GameAssets(*load_game_data(assets_file_name, commands_file_name, responses_file_name))
+    results = {'count' : args.count, 'bytes_per_object' : measure_objects(assets, args.count)}
+    results['bytes_per_session'] = measure_sessions(assets, args.count)['session']
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
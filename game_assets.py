@@ -0,0 +1,41 @@
+from types import MappingProxyType
+from game_model import compile_action_rules
+from game_parser import CommandParser
+
+def freeze_assets(value):
+    # recursively convert loaded JSON into read-only mappings and tuples so it can be shared safely
+    if isinstance(value, dict):
+        return MappingProxyType({k:freeze_assets(v) for k,v in value.items()})
+    elif isinstance(value, list):
+        return tuple(freeze_assets(x) for x in value)
+    return value
+
+
+
+
+
+class GameAssets():
+
+    # Constructor - frozen once, then shared read-only by every session built from it
+    def __init__(self, data:dict, commands:dict, responses:dict) -> None:
+        self._data = freeze_assets(data)
+        self._commands = freeze_assets(commands)
+        self._responses = freeze_assets(responses)
+        self._command_parser = CommandParser(self._commands)
+        self._action_rules = compile_action_rules(self._data)
+
+    # Getter Methods
+    def get_data(self):
+        return self._data
+
+    def get_commands(self):
+        return self._commands
+
+    def get_responses(self):
+        return self._responses
+
+    def get_action_rules(self):
+        return self._action_rules
+
+    def get_command_parser(self):
+        return self._command_parser
@@ -0,0 +1,46 @@
+import sys
+import time
+from game_sink import NullSink, StreamSink
+
+# Runs scripted command streams through GameController.try_parse at full speed.
+# Script files hold one command per line; blank lines and lines starting with '#' are ignored.
+
+def read_script(script_file_name:str) -> list:
+    # '-' reads the script from stdin
+    if script_file_name == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(script_file_name) as script_file:
+            lines = script_file.read().splitlines()
+    return [x.strip() for x in lines if x.strip() != '' and not x.lstrip().startswith('#')]
+
+def run_script(ctrl, commands:list, transcript=None) -> int:
+    # returns the number of commands run - stops early on an exit command or game over
+    # the game text goes wherever the session's view sink sends it; transcript only gets the echoed commands
+    count = 0
+    ctrl.print_response(ctrl.try_parse('describe'))
+    for command in commands:
+        if transcript is not None:
+            print(f"\n>>> {command}", file=transcript)
+        if ctrl.is_exit_command(command):
+            break
+        ctrl.print_response(ctrl.try_parse(command))
+        count += 1
+        if ctrl.is_game_over():
+            break
+    return count
+
+def run_batch(session_manager, commands:list, repeat:int=1, transcript=None) -> tuple:
+    # plays the script once per fresh session and returns (commands run, elapsed seconds)
+    # without a transcript the rendered text is discarded as it is written, so long runs hold none of it
+    total = 0
+    start = time.perf_counter()
+    for idx in range(repeat):
+        session = session_manager.create_session(sink=StreamSink(transcript) if transcript is not None else NullSink())
+        total += run_script(session.get_controller(), commands, transcript)
+        session_manager.destroy_session(session.get_session_id())
+    return (total, time.perf_counter() - start)
+
+def report(total:int, elapsed:float, stream=None) -> None:
+    rate = total / elapsed if elapsed > 0 else float('inf')
+    print(f"{total} commands in {elapsed:.3f}s ({rate:,.0f} commands/s)", file=stream or sys.stderr)
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import marshal
+import os
+import shutil
+import tempfile
+from game_stream import iter_asset_entries, assemble_entries, stream_game_data
+from game_text import TextStore, TextCompiler, attach_text_store
+
+# bump whenever the layout of the bundle payload changes
+# version 2 - descriptions moved out of the payload into a text block
+# version 3 - asset entries stored in small batches after the text block, so bundles load as a stream
+BUNDLE_VERSION = 3
+BUNDLE_SUFFIX = '.bundle'
+
+# a bundle is: header, commands, responses, text size, text block, then batches of (path, value) asset entries
+# up to None - each batch is stored as marshalled bytes, which load far faster than many small records
+ENTRY_BATCH_SIZE = 1000
+
+def get_bundle_file_name(assets_file_name:str) -> str:
+    # the bundle lives beside the assets file, e.g. game_assets.json -> game_assets.bundle
+    return os.path.splitext(assets_file_name)[0] + BUNDLE_SUFFIX
+
+def get_source_info(file_name:str) -> tuple:
+    stat = os.stat(file_name)
+    return (os.path.abspath(file_name), stat.st_mtime_ns, stat.st_size)
+
+def get_source_hash(file_name:str) -> str:
+    source_hash = hashlib.sha256()
+    with open(file_name, 'rb') as source_file:
+        for chunk in iter(lambda: source_file.read(1<<20), b''):
+            source_hash.update(chunk)
+    return source_hash.hexdigest()
+
+def is_world_object_entry(path:tuple) -> bool:
+    return len(path) == 3 and path[0] == 'world_objects'
+
+def compile_bundle(assets_file_name:str, commands_file_name:str, responses_file_name:str, bundle_file_name:str=None) -> None:
+    # stream the JSON sources once and write them out as a marshal bundle with a description text block
+    source_file_names = [assets_file_name, commands_file_name, responses_file_name]
+    header = {
+        'version' : BUNDLE_VERSION,
+        'sources' : [get_source_info(x) for x in source_file_names],
+        'hashes' : [get_source_hash(x) for x in source_file_names]}
+    compiler = TextCompiler()
+    # entries are spooled until the text block, which comes before them, is complete
+    with tempfile.TemporaryFile() as entries_file, open(assets_file_name) as assets_file:
+        batch = []
+        for path, value in iter_asset_entries(assets_file):
+            if is_world_object_entry(path):
+                compiler.compile(value)
+            batch.append((path, value))
+            if len(batch) == ENTRY_BATCH_SIZE:
+                marshal.dump(marshal.dumps(batch), entries_file)
+                batch = []
+        if len(batch) > 0:
+            marshal.dump(marshal.dumps(batch), entries_file)
+        marshal.dump(None, entries_file)
+        text = compiler.get_text()
+        def write_body(bundle_file):
+            for file_name in [commands_file_name, responses_file_name]:
+                with open(file_name) as json_file:
+                    marshal.dump(json.load(json_file), bundle_file)
+            marshal.dump(len(text), bundle_file)
+            bundle_file.write(text)
+            entries_file.seek(0)
+            shutil.copyfileobj(entries_file, bundle_file)
+        write_bundle(bundle_file_name or get_bundle_file_name(assets_file_name), header, write_body)
+
+def write_bundle(bundle_file_name:str, header:dict, write_body) -> None:
+    # write to a temporary file first so readers never see a half-written bundle
+    # processes still reading descriptions from the old bundle keep its (replaced) file mapped
+    tmp_file_name = f"{bundle_file_name}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file_name, 'wb') as bundle_file:
+            marshal.dump(header, bundle_file)
+            write_body(bundle_file)
+        os.replace(tmp_file_name, bundle_file_name)
+    except OSError:
+        # a read-only install still works, it just never gets the faster startup
+        if os.path.exists(tmp_file_name):
+            os.remove(tmp_file_name)
+
+def read_bundle(bundle_file_name:str, source_file_names:list):
+    # returns the cached (data, commands, responses) with TextRefs for descriptions, or None when missing or stale
+    try:
+        with open(bundle_file_name, 'rb') as bundle_file:
+            header = marshal.load(bundle_file)
+            if not isinstance(header, dict) or header.get('version') != BUNDLE_VERSION:
+                return None
+            sources = [get_source_info(x) for x in source_file_names]
+            if header.get('sources') != sources:
+                # mtimes differ - only rebuild if the contents actually changed
+                if header.get('hashes') != [get_source_hash(x) for x in source_file_names]:
+                    return None
+                header['sources'] = sources
+                body_offset = bundle_file.tell()
+                write_bundle(bundle_file_name, header, lambda x: shutil.copyfileobj(bundle_file, x))
+                bundle_file.seek(body_offset)
+            commands = marshal.load(bundle_file)
+            responses = marshal.load(bundle_file)
+            text_size = marshal.load(bundle_file)
+            # mapped now, so it keeps reading this copy of the bundle even if it is replaced
+            store = TextStore(bundle_file, bundle_file.tell())
+            bundle_file.seek(text_size, os.SEEK_CUR)
+            data = assemble_entries(read_entries(bundle_file, store))
+        return (data, commands, responses)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+def read_entries(bundle_file, store):
+    # yields the (path, value) asset entries of a bundle, with TextRefs for their descriptions
+    while True:
+        batch = marshal.load(bundle_file)
+        if batch is None:
+            return
+        for path, value in marshal.loads(batch):
+            if is_world_object_entry(path):
+                attach_text_store(value, store)
+            yield path, value
+
+def load_game_data(assets_file_name:str, commands_file_name:str, responses_file_name:str):
+    # returns (data, commands, responses), rebuilding the bundle when the JSON sources change
+    # data is read-only, ready to share through GameAssets
+    source_file_names = [assets_file_name, commands_file_name, responses_file_name]
+    bundle_file_name = get_bundle_file_name(assets_file_name)
+    payload = read_bundle(bundle_file_name, source_file_names)
+    if payload is None:
+        compile_bundle(assets_file_name, commands_file_name, responses_file_name, bundle_file_name)
+        payload = read_bundle(bundle_file_name, source_file_names)
+    if payload is None:
+        # no bundle could be written - stream the JSON sources directly
+        payload = [stream_game_data(assets_file_name)]
+        for file_name in [commands_file_name, responses_file_name]:
+            with open(file_name) as json_file:
+                payload.append(json.load(json_file))
+        payload = tuple(payload)
+    return payload
+
+if __name__ == '__main__':
+    # explicit compile step, e.g. as part of a deployment
+    compile_bundle('game_assets.json', 'game_command_map.json', 'game_responses.json')
@@ -1,9 +1,15 @@
+from collections.abc import Mapping
+from types import MappingProxyType
+from game_text import resolve_text
+
 class WorldObject():
+    __slots__ = ('_name', '_state', '_starting_state', '_current_state', '_description_length')
 
     # Constructor
     def __init__(self, name:str, state:dict, starting_state:str) -> None:
         self._name = name
         self._state = state
+        self._starting_state = starting_state
         self._current_state = starting_state
         self._description_length = 'long'
 
@@ -12,12 +18,19 @@ class WorldObject():
         self._current_state = next_state
         self._description_length = 'long'
 
+    def set_description_length(self, description_length:str) -> None:
+        self._description_length = description_length
+
     # Getter Methods
     def get_name(self) -> str:
         return self._name
 
+    def get_description_length(self) -> str:
+        return self._description_length
+
     def get_description(self) -> str:
-        result = self._state.get(self._current_state).get('description').get(self._description_length)
+        # compiled assets keep descriptions in a memory-mapped TextStore until they are shown
+        result = resolve_text(self._state.get(self._current_state).get('description').get(self._description_length))
         # Set description length to 'short' when 'long' description is requested
         if self._description_length == 'long':
             self._description_length = 'short'
@@ -26,6 +39,15 @@ class WorldObject():
     def get_current_state(self) -> str:
         return self._current_state
 
+    def get_starting_state(self) -> str:
+        return self._starting_state
+
+    def has_state(self, state_name:str) -> bool:
+        return state_name in self._state
+
+    def get_state_names(self) -> list:
+        return list(self._state.keys())
+
     def get_is_player(self) -> bool:
         # to be overriden by subclasses
         return False
@@ -34,13 +56,24 @@ class WorldObject():
 
 
 class Room(WorldObject):
+    __slots__ = ('_connections', '_owns_connections', '_connection_listener', '_game_objects',
+        '_object_order', '_object_count', '_free_objects', '_free_object_list', '_fragments')
 
     # Constructor
     def __init__(self, name:str, state:dict, starting_state:str) -> None:
         super().__init__(name, state, starting_state)
-        # override
+        # override - starts out sharing the asset's connections, copied on first write
         self._connections = self._state.get(self._current_state).get('connections')
+        self._owns_connections = False
+        self._connection_listener = None
         self._game_objects = {}
+        # index of the game objects currently in the 'free' state, kept in the order they entered the room
+        self._object_order = {}
+        self._object_count = 0
+        self._free_objects = {}
+        self._free_object_list = None
+        # rendered text ('connections', 'free_objects') cached until the mutations that affect it
+        self._fragments = {}
 
     # Setter Methods
 
@@ -51,13 +84,64 @@ class Room(WorldObject):
         self.set_connections(self._state.get(self._current_state).get('connections'))
 
     def set_connections(self, connections:dict) -> None:
-        self._connections.update(connections)
+        changed = {k:v for k,v in connections.items() if self._connections.get(k) != v}
+        if len(changed) == 0:
+            return
+        # copy-on-write so the shared asset connections are never modified
+        if not self._owns_connections:
+            self._connections = dict(self._connections)
+            self._owns_connections = True
+        self._connections.update(changed)
+        self._fragments.pop('connections', None)
+        if self._connection_listener is not None:
+            self._connection_listener(self._name, changed)
+
+    def reset_connections(self, connections:dict) -> None:
+        # replaces the connections outright - set_connections can only add and redirect passages
+        self._connections = dict(connections)
+        self._owns_connections = True
+        self._fragments.pop('connections', None)
+
+    def set_connection_listener(self, connection_listener) -> None:
+        # called with (room name, {direction: room name}) whenever connections are added or redirected
+        self._connection_listener = connection_listener
 
     def set_game_objects(self, game_objects:dict) -> None:
+        for name, game_object in game_objects.items():
+            if name not in self._object_order:
+                self._object_order[name] = self._object_count
+                self._object_count += 1
         self._game_objects.update(game_objects)
+        for game_object in game_objects.values():
+            game_object.set_container(self)
+            self.update_free_object(game_object)
 
     def remove_game_objects(self, game_object_key:str) -> None:
-        self._game_objects.pop(game_object_key)
+        game_object = self._game_objects.pop(game_object_key)
+        self._object_order.pop(game_object_key)
+        if game_object.get_container() is self:
+            game_object.set_container(None)
+        if self._free_objects.pop(game_object_key, None) is not None:
+            self._free_object_list = None
+            self._fragments.pop('free_objects', None)
+
+    def update_free_object(self, game_object) -> None:
+        # called by a contained game object whenever its state changes
+        name = game_object.get_name()
+        is_free = game_object.get_current_state() == 'free'
+        if is_free != (name in self._free_objects):
+            if is_free:
+                self._free_objects[name] = game_object
+            else:
+                self._free_objects.pop(name)
+            self._free_object_list = None
+        elif not is_free:
+            return
+        # a free object going back to 'free' also gets its long description again
+        self._fragments.pop('free_objects', None)
+
+    def set_fragment(self, key:str, text:str) -> None:
+        self._fragments[key] = text
 
     # Getter Methods
     def get_room_name(self) -> str:
@@ -66,33 +150,68 @@ class Room(WorldObject):
     def get_connections(self) -> dict:
         return self._connections
 
+    def get_state_connections(self, state_name:str) -> dict:
+        # connections as defined by the assets for one of this room's states
+        return self._state.get(state_name).get('connections') or {}
+
     def get_game_objects(self) -> dict:
         return self._game_objects
 
+    def get_fragment(self, key:str) -> str:
+        # None if not rendered since the last change
+        return self._fragments.get(key)
+
+    def get_free_objects(self) -> list:
+        # game objects in the 'free' state, in room order - costs O(free objects), rebuilt only after a change
+        if self._free_object_list is None:
+            self._free_object_list = sorted(self._free_objects.values(), key=lambda x: self._object_order[x.get_name()])
+        return self._free_object_list
+
 
 
 
 
 class GameObject(WorldObject):
+    __slots__ = ('_starting_room_name', '_current_room_name', '_container')
 
     # Constructor
     def __init__(self, name:str, state:dict, starting_room_name:str, starting_state:str) -> None:
         super().__init__(name, state, starting_state)
+        self._starting_room_name = starting_room_name
         self._current_room_name = starting_room_name
+        self._container = None
+
+    # Setter Methods
+
+    # override - keeps the free-object index of the room holding this object up to date
+    def set_current_state(self, next_state:str) -> None:
+        super().set_current_state(next_state)
+        if self._container is not None:
+            self._container.update_free_object(self)
 
-    # Setter Method
     def set_room_name(self,room_name) -> None:
         self._current_room_name = room_name
 
-    # Getter Method
+    def set_container(self, container) -> None:
+        # the Room whose game objects include this object, set by the Room itself
+        self._container = container
+
+    # Getter Methods
     def get_room_name(self) -> str:
         return self._current_room_name
 
+    def get_container(self):
+        return self._container
+
+    def get_starting_room_name(self) -> str:
+        return self._starting_room_name
+
 
 
 
 
 class Character(GameObject):
+    __slots__ = ('_inventory', '_is_player')
 
     # Constructor
     def __init__(self, name:str, state:dict, starting_room_name:str, starting_state:str, is_player:bool) -> None:
@@ -122,6 +241,7 @@ class Character(GameObject):
 
 
 class Item(GameObject):
+    __slots__ = ('_in_inventory_of', '_is_carryable', '_is_equippable')
 
     # Constructor
     def __init__(self, name:str, state:dict, starting_room_name:str, starting_state:str, is_carryable:bool, is_equippable:bool) -> None:
@@ -146,48 +266,77 @@ class Item(GameObject):
 
 
 
-class Action():
+class ActionRule():
+    __slots__ = ('_action_name', '_target_name', '_req_state', '_next_state', '_state_updates', '_description_success')
 
-    # Constructor
-    def __init__(self, available_actions:dict={}, action_name:str='', actor_name:str='', target_name:str='') -> None:
+    # Constructor - immutable once built, shared by every command and session using the same (action, target)
+    def __init__(self, action_name:str, target_name:str, req_state:dict={}, next_state:dict={},
+                 description_success:str='', world_object_names=()) -> None:
         self._action_name = action_name
-        self._actor_name = actor_name
-        self._target_name = target_name
-        self._req_state = {}
-        self._next_state = {}
-        self._description_success = ''
-
-        if action_name in available_actions.keys():
-            # get specific action/target details from available actions
-            action_dict = available_actions.get(self._action_name)
-            target_dict = action_dict.get(self._target_name)
-
-            # if specific action/target details exist, extract the required and next state information
-            if target_name in action_dict.keys() and action_name != 'describe':
-                self._req_state = target_dict.get('req_state')
-                self._next_state = target_dict.get('next_state')
-                self._description_success = target_dict.get('description_success')
-
-
-    # Setter Functions
-    def set_target_name(self, target_name) -> None:
         self._target_name = target_name
+        # required states become frozensets for constant-time membership checks
+        self._req_state = MappingProxyType(
+            {k:(None if v is None else frozenset(v)) for k,v in req_state.items()})
+        self._next_state = MappingProxyType(dict(next_state))
+        # state updates are resolved to (kind, name, next_state) once, instead of on every command
+        updates = []
+        for name, state in next_state.items():
+            if name in world_object_names:
+                updates.append(('object', name, state))
+            elif name in ('target', 'actor', 'room'):
+                updates.append((name, None, state))
+        self._state_updates = tuple(updates)
+        self._description_success = description_success
 
     # Getter Functions
-    def get_actor_name(self) -> str:
-        return self._actor_name
+    def get_action_name(self) -> str:
+        return self._action_name
 
     def get_target_name(self) -> str:
         return self._target_name
 
-    def get_action_name(self) -> str:
-        return self._action_name
-
     def get_req_state(self):
         return self._req_state
 
     def get_next_state(self):
         return self._next_state
 
+    def get_state_updates(self) -> tuple:
+        return self._state_updates
+
     def get_description_success(self):
-        return self._description_success
\ No newline at end of file
+        return self._description_success
+
+
+
+
+
+class ActionRuleTable():
+
+    # Constructor - compiles every (action, target) rule in the assets' "actions" section up front
+    def __init__(self, available_actions:dict, world_object_names=()) -> None:
+        self._available_actions = available_actions
+        self._world_object_names = frozenset(world_object_names)
+        self._rules = {}
+        for action_name, action_dict in available_actions.items():
+            for target_name, target_dict in action_dict.items():
+                if action_name != 'describe' and isinstance(target_dict, Mapping) and 'next_state' in target_dict:
+                    self._rules[(action_name, target_name)] = ActionRule(
+                        action_name, target_name,
+                        target_dict.get('req_state') or {},
+                        target_dict.get('next_state') or {},
+                        target_dict.get('description_success'),
+                        self._world_object_names)
+
+    # Returns the rule for (action, target) - pairs without an entry get a shared rule with no conditions
+    def get_rule(self, action_name:str, target_name:str) -> ActionRule:
+        rule = self._rules.get((action_name, target_name))
+        if rule is None:
+            rule = self._rules.setdefault((action_name, target_name), ActionRule(action_name, target_name))
+        return rule
+
+    def get_rules(self) -> dict:
+        return self._rules
+
+    def get_available_actions(self) -> dict:
+        return self._available_actions
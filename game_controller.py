@@ -1,27 +1,50 @@
 from game_model import *
 from game_view import * 
 from game_classes import *
+from game_parser import CommandParser
+import time
 
 class GameController():
-    _instance = None
 
-    @staticmethod
-    def get_instance(game_model, game_view):
-        if GameController._instance is None:
-            GameController(game_model, game_view)
-        return GameController._instance
+    # Constructor - one instance per game session, optionally sharing a precompiled CommandParser
+    def __init__(self, game_model, game_view, command_parser=None) -> None:
+        self._game_model = game_model
+        self._game_view = game_view
+        if command_parser is None:
+            command_parser = CommandParser(game_view.get_command_map())
+        self._command_parser = command_parser
+        self._latency_recorder = None
 
-    def __init__(self, game_model, game_view) -> None:
-        if GameController._instance is not None:
-            raise Exception("This class is a Singleton")
-        else:
-            GameController._instance = self
-            self._game_model = game_model
-            self._game_view = game_view
+    # Timing hooks around each try_parse stage - with no recorder set they cost one attribute check
+    def set_latency_recorder(self, latency_recorder) -> None:
+        self._latency_recorder = latency_recorder
+
+    def get_latency_recorder(self):
+        return self._latency_recorder
+
+    def __now(self) -> float:
+        return 0.0 if self._latency_recorder is None else time.perf_counter()
+
+    def __lap(self, action_name:str, stage:str, start:float) -> float:
+        # records the time since start under (action, stage) and returns the new start
+        if self._latency_recorder is None:
+            return 0.0
+        now = time.perf_counter()
+        self._latency_recorder.record(action_name, stage, now - start)
+        return now
+
+    def get_model(self):
+        return self._game_model
 
     def clear_screen(self) -> None:
         self._game_view.clear_screen()
 
+    def wait_for_output(self) -> None:
+        self._game_view.wait_output()
+
+    def skip_output(self) -> None:
+        self._game_view.skip_output()
+
     def is_exit_command(self, command:str) -> bool:
         return True if str.lower(command) in ['q','quit','exit'] else False
 
@@ -47,91 +70,94 @@ class GameController():
             self._game_view.print_message_slow(response)
 
     def try_parse(self, command:str) -> str:
-        result = ''
+        command_start = start = self.__now()
 
-        # try parsing the input command - returns a response code and an Action() object
+        # try parsing the input command - returns a response code and a compiled ActionRule
         (response, action) = self.parse_command(command)
 
         if response != 'success':
             # if command was unsuccessfully parsed, return error code
-            result = response
-        else: 
-            # if command was successfully parsed, perform action based on action_name
-            action_name = action.get_action_name()
-            target_name = action.get_target_name()
-            player = self._game_model.get_world_objects().get(self._game_model.get_player_name())
-            all_rooms = self._game_model.get_rooms()
-            current_room = all_rooms.get(player.get_room_name())
+            self.__lap(response or 'empty', 'parse', start)
+            return response
 
-            if action_name in ["help","inventory"]:
-                # special case - 'help' and 'inventory' are keywords which are understood further downstream
-                result = action_name
-
-            elif action_name == "describe":
-                # special case - 'describe' conditions are always true and never updates state
-                # if no target specified, assume target is current room of player
-                if target_name is None:
-                    action.set_target_name(current_room.get_room_name())
-                result = self.perform_describe(action)
-
-                # if the target of the describe command was a room, also check for free objects and connections
-                if action.get_target_name() in all_rooms.keys():
-                    result += self.describe_free_objects(action)
-                    result += self.describe_room_connections(action)
-
-            elif action_name == "move":
-                # special case
-                result = self.perform_move(action)
-
-                # update book state each time player changes rooms
-                self._game_model.get_world_objects().get('book').set_current_state('inventory '+player.get_room_name())
+        # if command was successfully parsed, perform action based on action_name
+        self.__lap(action.get_action_name(), 'parse', start)
+        result = self.perform_command(action)
+        self.__lap(action.get_action_name(), 'total', command_start)
+        return result
 
-            else:
-                # general case - may result in change of state
-                result = self.perform_action(action) 
+    # Performs an already parsed command, e.g. one chosen directly from the rule table
+    def perform_command(self, action) -> str:
+        result = ''
+        start = self.__now()
+        action_name = action.get_action_name()
+        target_name = action.get_target_name()
+        player = self._game_model.get_world_objects().get(self._game_model.get_player_name())
+        all_rooms = self._game_model.get_rooms()
+        current_room = all_rooms.get(player.get_room_name())
+
+        if action_name in ["help","inventory"]:
+            # special case - 'help' and 'inventory' are keywords which are understood further downstream
+            result = action_name
+
+        elif action_name == "describe":
+            # special case - 'describe' conditions are always true and never updates state
+            # if no target specified, assume target is current room of player
+            if target_name is None:
+                action = self.__get_rule(action_name, current_room.get_room_name())
+            result = self.perform_describe(action)
+
+            # if the target of the describe command was a room, also check for free objects and connections
+            if action.get_target_name() in all_rooms.keys():
+                result += self.describe_free_objects(action)
+                result += self.describe_room_connections(action)
+            self.__lap(action_name, 'render', start)
+
+        elif action_name == "move":
+            # special case
+            result = self.__move(action)
+
+        elif action_name == "travel":
+            # special case - walks the shortest known path to a room, one move at a time
+            result = self.perform_travel(action)
 
-                # if general case unlocks a room, also add the new room description to the result
-                if action.get_next_state().get('room','') == 'free':
-                    result += '\n'+current_room.get_description()
+        else:
+            # general case - may result in change of state
+            result = self.perform_action(action) 
+
+            # if general case unlocks a room, also add the new room description to the result
+            if action.get_next_state().get('room','') == 'free':
+                start = self.__now()
+                result += '\n'+self._game_model.show_description(current_room.get_name())
+                self.__lap(action_name, 'render', start)
         return result
 
     def parse_command(self, command:str):
-        # split the command
-        split_text = []
-        command_map = self._game_view.get_command_map()
-        available_actions = self._game_model.get_available_actions()
-
-        # null case
-        if command is None or command == '':
-            return ('',Action(available_actions))
-
-
-        for idx,x in enumerate(command.split()):
-            next_token = str.lower(x)
-            if next_token in command_map.keys():
-                next_token = command_map.get(next_token).split()
-            elif idx==0:
-                return ('error action',Action(available_actions))
-            else:
-                return ('error target',Action(available_actions))
-            split_text.extend(next_token)
-        split_text = list(dict.fromkeys(split_text))
+        # returns a response code and the shared ActionRule for the parsed (action, target), if any
+        (response, pair) = self._command_parser.parse(command)
+        if response != 'success':
+            return (response, None)
+        return ('success', self.__get_rule(*pair))
 
-        action_name = split_text[0]
-        target_name = split_text[1] if len(split_text) > 1 else None
-        actor_name = self._game_model.get_player_name()
-        return ('success', Action(available_actions, action_name, actor_name, target_name))
+    def __get_rule(self, action_name:str, target_name:str):
+        return self._game_model.get_action_rules().get_rule(action_name, target_name)
 
     def perform_action(self, action) -> str:
         # check if conditions for actions are met
+        action_name = action.get_action_name()
+        start = self.__now()
         if self.__meets_conditions(action):
+            start = self.__lap(action_name, 'conditions', start)
             # update state of objects involved in the action
             self.__update_states(action)
+            start = self.__lap(action_name, 'state_update', start)
             # update inventory of objects involved in the action
             self.__update_inventory(action)
+            self.__lap(action_name, 'inventory_update', start)
             # return the result of the action succeeding
             result = action.get_description_success()
         else:
+            self.__lap(action_name, 'conditions', start)
             result = 'error target'
         return result
 
@@ -141,55 +167,91 @@ class GameController():
 
         # Add description of target to result if in the same room
         if player.get_room_name() == target.get_room_name():
-            return target.get_description()
+            return self._game_model.show_description(target.get_name())
         else:
             return 'error target'
 
     def describe_free_objects(self, action) -> str:
-        # check for free items in the room
-        result = ''
+        # check for free items in the room - reused until the room's free objects change
         target = self._game_model.get_world_objects().get(action.get_target_name())
-        for obj_name,obj in target.get_game_objects().items():
-            if obj.get_current_state() == "free" and obj_name != self._game_model.get_player_name():
-                result += '\nIn the room, there is '+obj.get_description()
+        result = target.get_fragment('free_objects')
+        if result is not None:
+            return result
+        lines = []
+        cacheable = True
+        for obj in target.get_free_objects():
+            if obj.get_name() != self._game_model.get_player_name():
+                # long descriptions are shown once, so only text made of short ones can be reused
+                cacheable = cacheable and obj.get_description_length() == 'short'
+                lines.append('\nIn the room, there is '+self._game_model.show_description(obj.get_name()))
+        result = ''.join(lines)
+        if cacheable:
+            target.set_fragment('free_objects', result)
         return result
 
     def describe_room_connections(self, action) -> str:
-        # check for connections to other rooms
-        result = ''
+        # check for connections to other rooms - reused until the room's connections change
         target = self._game_model.get_world_objects().get(action.get_target_name())
-        if len(target.get_connections()) > 0:
+        result = target.get_fragment('connections')
+        if result is None:
             directions = list(target.get_connections().keys())
-            if len(target.get_connections()) == 1:
-                result += f'\nYou can see a passage to the {directions[0]}.'
+            if len(directions) == 0:
+                result = ''
+            elif len(directions) == 1:
+                result = f'\nYou can see a passage to the {directions[0]}.'
             else:
-                result += f'\nYou can see passages to the {directions[0]}'
-                for direction in directions[1:-1]:
-                    result += f'{direction}, '
-                result += f' and {directions[-1]}.'
+                result = f'\nYou can see passages to the {join_words(directions)}.'
+            target.set_fragment('connections', result)
         return result
 
+    def __move(self, action) -> str:
+        result = self.perform_move(action)
+        self.__update_book()
+        return result
+
+    def __update_book(self) -> None:
+        # update book state each time player changes rooms (worlds without the book skip this)
+        if 'book' in self._game_model.get_world_objects():
+            player = self._game_model.get_world_objects().get(self._game_model.get_player_name())
+            self._game_model.set_object_state('book', 'inventory '+player.get_room_name())
+
+    def perform_travel(self, action) -> str:
+        player = self._game_model.get_world_objects().get(self._game_model.get_player_name())
+        if action.get_target_name() not in self._game_model.get_rooms():
+            return "error room"
+        path = self._game_model.get_room_graph().get_path(player.get_room_name(), action.get_target_name())
+        if path is None:
+            return "error room"
+        if len(path) == 0:
+            return self.perform_describe(self.__get_rule('describe', action.get_target_name()))
+        # rooms passed through are only walked through - describing them would mark them as seen,
+        # so the player would never get their long descriptions
+        for direction, room_name in path[:-1]:
+            if self._game_model.get_rooms()[player.get_room_name()].get_connections().get(direction) != room_name:
+                return "error room"
+            self._game_model.move_character(self._game_model.get_player_name(), room_name)
+            self.__update_book()
+        return self.__move(self.__get_rule('move', path[-1][0]))
+
     def perform_move(self, action) -> str:
         # translate the name of the target into the correct room name based on the actor's current location
-        actor = self._game_model.get_world_objects().get(action.get_actor_name())
+        start = self.__now()
+        actor_name = self._game_model.get_player_name()
+        actor = self._game_model.get_world_objects().get(actor_name)
         prev_room = self._game_model.get_world_objects().get(actor.get_room_name())
         next_room_name = prev_room.get_connections().get(action.get_target_name())
         next_room = self._game_model.get_world_objects().get(next_room_name)
         if next_room is None:
             return "error room"
 
-        # update the actor's location to the next room - and its inventory
-        actor.set_room_name(next_room_name)
-        for inv_item_name, inv_item in actor.get_inventory().items():
-            inv_item.set_room_name(next_room_name)
-
-        # update the previous and next room's game objects
-        prev_room.remove_game_objects(action.get_actor_name())
-        next_room.set_game_objects({action.get_actor_name():actor})
+        # update the actor's location to the next room - and its inventory - and both rooms' game objects
+        self._game_model.move_character(actor_name, next_room_name)
+        start = self.__lap(action.get_action_name(), 'state_update', start)
 
         # return description of next room
-        action.set_target_name(next_room_name)
-        return self.perform_describe(action)
+        result = self.perform_describe(self.__get_rule('describe', next_room_name))
+        self.__lap(action.get_action_name(), 'render', start)
+        return result
 
     def __meets_conditions(self, action) -> bool:
         actor = self._game_model.get_world_objects().get(self._game_model.get_player_name())
@@ -202,7 +264,7 @@ class GameController():
             # check if actor and target in the same room
             is_same_room = actor.get_room_name() == target.get_room_name()
 
-            # check if actor and target in the required states
+            # check if actor and target in the required states (frozensets compiled with the rule)
             actor_req_state = action.get_req_state().get("actor")
             target_req_state = action.get_req_state().get("target")
             is_actor_in_req_state = (actor_req_state is None) or (actor.get_current_state() in actor_req_state)
@@ -211,27 +273,28 @@ class GameController():
             return is_same_room and is_actor_in_req_state and is_target_in_req_state
 
     def __update_states(self, action) -> None:
-        actor = self._game_model.get_world_objects().get(action.get_actor_name())
-
-        for name, next_state in action.get_next_state().items(): 
-            if name in self._game_model.get_world_objects().keys():
-                world_object = self._game_model.get_world_objects().get(name)
-            elif name == 'target':
-                world_object = self._game_model.get_world_objects().get(action.get_target_name())
-            elif name == 'actor':
+        world_objects = self._game_model.get_world_objects()
+        actor = world_objects.get(self._game_model.get_player_name())
+
+        # each update was resolved to its kind when the rule was compiled
+        for kind, name, next_state in action.get_state_updates():
+            if kind == 'object':
+                world_object = world_objects.get(name)
+            elif kind == 'target':
+                world_object = world_objects.get(action.get_target_name())
+            elif kind == 'actor':
                 world_object = actor
-            elif name == 'room':
+            else:
                 world_object = self._game_model.get_rooms().get(actor.get_room_name())
 
-            world_object.set_current_state(next_state)
+            self._game_model.set_object_state(world_object.get_name(), next_state)
 
     def __update_inventory(self, action) -> None:
-        if action.get_target_name() in self._game_model.get_game_objects().keys():
-            actor = self._game_model.get_game_objects().get(action.get_actor_name())
-            item = self._game_model.get_game_objects().get(action.get_target_name())
+        game_objects = self._game_model.get_game_objects()
+        if action.get_target_name() in game_objects:
+            actor = game_objects.get(self._game_model.get_player_name())
+            item = game_objects.get(action.get_target_name())
             if 'inventory' in item.get_current_state():
-                item.add_inventory_of(actor)
-                actor.add_to_inventory({action.get_target_name():item})
+                self._game_model.add_to_inventory(actor.get_name(), item.get_name())
             elif 'consumed' in item.get_current_state() or action.get_action_name() in ['drop']:
-                item.remove_inventory_of()
-                actor.remove_from_inventory({action.get_target_name():item})
+                self._game_model.remove_from_inventory(actor.get_name(), item.get_name())
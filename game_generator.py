@@ -0,0 +1,269 @@
+import argparse
+import json
+import math
+import random
+
+# Builds worlds in the game_assets.json format for load testing - the same seed and settings always
+# produce the same world, so benchmark runs can be reproduced. Worlds can be built in memory, or
+# streamed straight to disk one object at a time for worlds of millions of objects.
+
+TOPOLOGIES = ['corridor', 'grid', 'tree']
+
+DIRECTIONS = {
+    'north':'south', 'south':'north', 'east':'west', 'west':'east',
+    'northeast':'southwest', 'southwest':'northeast', 'northwest':'southeast', 'southeast':'northwest',
+    'up':'down', 'down':'up'}
+
+SHORT_DIRECTIONS = {'n':'north', 's':'south', 'e':'east', 'w':'west', 'ne':'northeast', 'sw':'southwest',
+    'nw':'northwest', 'se':'southeast', 'u':'up', 'd':'down'}
+
+# actions that take a held prop out of its last state - one per state beyond 'free' and 'in_inventory'
+PROP_VERBS = [('polish','polished'), ('shake','shaken'), ('twist','twisted'), ('fold','folded'),
+    ('light','lit'), ('tap','tapped'), ('wind','wound'), ('rub','rubbed')]
+
+ADJECTIVES = ['dusty', 'gleaming', 'cracked', 'ancient', 'tiny', 'heavy', 'crooked', 'faded', 'sturdy', 'odd',
+    'velvet', 'rusted', 'painted', 'hollow', 'warm', 'cold']
+NOUNS = ['lamp', 'vase', 'rope', 'coin', 'boot', 'mask', 'bell', 'jar', 'quill', 'shell', 'map', 'stone',
+    'cup', 'whistle', 'spoon', 'ribbon']
+FILLER = ['the', 'air', 'smells', 'of', 'old', 'wax', 'and', 'something', 'moves', 'in', 'shadows', 'light',
+    'falls', 'across', 'floor', 'walls', 'are', 'quiet', 'here']
+
+def with_article(words:str) -> str:
+    return f"{'an' if words[0] in 'aeiou' else 'a'} {words}"
+
+def get_state(descriptions:dict, connections:dict=None) -> dict:
+    state = {'description':descriptions}
+    if connections is not None:
+        state['connections'] = connections
+    return state
+
+def get_rule(req_state:dict, next_state:dict, description_success) -> dict:
+    return {'req_state':req_state, 'next_state':next_state, 'description_success':description_success}
+
+
+
+
+
+class WorldGenerator():
+
+    # Constructor - the room graph is laid out up front, everything else is generated on demand per room
+    def __init__(self, seed:int=0, room_count:int=10, topology:str='corridor', objects_per_room:int=10,
+            state_count:int=2, characters_per_room:int=0, words_per_description:int=8) -> None:
+        if topology not in TOPOLOGIES:
+            raise ValueError(f"Unknown topology '{topology}', expected one of {', '.join(TOPOLOGIES)}")
+        if room_count < 1:
+            raise ValueError("A world needs at least one room")
+        if not 2 <= state_count <= 2 + len(PROP_VERBS):
+            raise ValueError(f"state_count must be between 2 and {2 + len(PROP_VERBS)}")
+        self._seed = seed
+        self._room_count = room_count
+        self._topology = topology
+        self._objects_per_room = objects_per_room
+        self._state_count = state_count
+        self._characters_per_room = characters_per_room
+        self._words_per_description = words_per_description
+        self._connections = self.__lay_out_rooms()
+
+    def __lay_out_rooms(self) -> list:
+        # [{direction: room index}, ...] - every passage has a passage back in the opposite direction
+        connections = [{} for r in range(self._room_count)]
+        def connect(a, b, direction):
+            connections[a][direction] = b
+            connections[b][DIRECTIONS[direction]] = a
+        if self._topology == 'corridor':
+            for r in range(1, self._room_count):
+                connect(r - 1, r, 'north')
+        elif self._topology == 'grid':
+            width = math.ceil(math.sqrt(self._room_count))
+            for r in range(1, self._room_count):
+                if r % width > 0:
+                    connect(r - 1, r, 'east')
+                if r >= width:
+                    connect(r - width, r, 'north')
+        else:
+            # each room hangs off a random earlier room that still has a free direction
+            rng = random.Random(f"{self._seed}:layout")
+            open_rooms = [0]
+            for r in range(1, self._room_count):
+                index = rng.randrange(len(open_rooms))
+                parent = open_rooms[index]
+                directions = [x for x in DIRECTIONS if x not in connections[parent]]
+                connect(parent, r, rng.choice(directions))
+                if len(directions) == 1:
+                    open_rooms[index] = open_rooms[-1]
+                    open_rooms.pop()
+                open_rooms.append(r)
+        return connections
+
+    # Getter Methods
+    def get_room_count(self) -> int:
+        return self._room_count
+
+    def get_object_count(self) -> int:
+        # every game object, including the player
+        return 1 + self._room_count * (self._objects_per_room + self._characters_per_room + 2)
+
+    def get_room_name(self, r:int) -> str:
+        return f"Room {r}"
+
+    def get_start_room_name(self) -> str:
+        return self.get_room_name(0)
+
+    def get_room_connections(self, r:int) -> dict:
+        return {direction:self.get_room_name(x) for direction,x in self._connections[r].items()}
+
+    def get_prop_verbs(self) -> list:
+        return PROP_VERBS[:self._state_count - 2]
+
+    def __get_rng(self, r:int):
+        # one generator per room, so any room can be regenerated without replaying the others
+        return random.Random(f"{self._seed}:{r}")
+
+    def __get_descriptions(self, rng, subject:str) -> dict:
+        words = [rng.choice(FILLER) for x in range(self._words_per_description)]
+        return {'long':f"{subject}. {' '.join(words).capitalize()}.", 'short':f"{subject}."}
+
+    def iter_rooms(self):
+        # yields (room name, room) - rooms start 'free', their 'init' state only leads back the way you came
+        for r in range(self._room_count):
+            rng = self.__get_rng(r)
+            connections = self.get_room_connections(r)
+            back = {k:v for k,v in connections.items() if self._connections[r][k] < r}
+            yield self.get_room_name(r), {
+                'starting_state':'free',
+                'state':{
+                    'init':get_state(self.__get_descriptions(rng, f"The {rng.choice(ADJECTIVES)} room, sealed shut"), back),
+                    'free':get_state(self.__get_descriptions(rng, f"The {rng.choice(ADJECTIVES)} room"), connections)}}
+
+    def iter_game_objects(self):
+        # yields (object name, object) - the player, then each room's props, chest, barrier and characters
+        yield 'player', {'is_playable':True, 'starting_room':self.get_start_room_name(), 'starting_state':'free',
+            'state':{'free':get_state({'long':"You, ready for anything.", 'short':"You."})}}
+        for r in range(self._room_count):
+            rng = self.__get_rng(r)
+            room_name = self.get_room_name(r)
+            for o in range(self._objects_per_room):
+                subject = with_article(f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}")
+                states = {'free':get_state(self.__get_descriptions(rng, subject.capitalize())),
+                    'in_inventory':get_state({'long':f"{subject.capitalize()}, in your pack.", 'short':subject.capitalize()})}
+                for verb, state_name in self.get_prop_verbs():
+                    states[state_name] = get_state({'long':f"{subject.capitalize()}, now {state_name}.", 'short':f"{subject.capitalize()}, {state_name}."})
+                yield f"prop_{r}_{o}", {'is_carryable':True, 'is_equippable':False, 'starting_room':room_name,
+                    'starting_state':'free', 'state':states}
+            for kind, end_state in [('chest', 'opened'), ('barrier', 'broken')]:
+                yield f"{kind}_{r}", {'is_carryable':False, 'is_equippable':False, 'starting_room':room_name,
+                    'starting_state':'free', 'state':{
+                        'free':get_state(self.__get_descriptions(rng, with_article(f"{rng.choice(ADJECTIVES)} {kind}").capitalize())),
+                        end_state:get_state({'long':f"The {kind} lies {end_state}.", 'short':f"A {end_state} {kind}."})}}
+            for c in range(self._characters_per_room):
+                yield f"npc_{r}_{c}", {'is_playable':False, 'starting_room':room_name, 'starting_state':'free',
+                    'state':{
+                        'free':get_state(self.__get_descriptions(rng, with_article(f"{rng.choice(ADJECTIVES)} stranger").capitalize())),
+                        'unconscious':get_state({'long':"A stranger lies out cold.", 'short':"An unconscious stranger."})}}
+
+    def get_action_names(self) -> list:
+        return ['help', 'describe', 'inventory', 'travel', 'move', 'pickup', 'drop'] + \
+            [x for x,y in self.get_prop_verbs()] + ['open', 'attack']
+
+    def iter_action_rules(self, action_name:str):
+        # yields (target name, rule) for one action - the rules of an action are grouped in the assets
+        if action_name == 'move':
+            for direction in DIRECTIONS:
+                yield direction, get_rule({'actor':['free']}, {}, None)
+            return
+        held = ['in_inventory'] + [y for x,y in self.get_prop_verbs()]
+        verbs = dict(self.get_prop_verbs())
+        for r in range(self._room_count):
+            for o in range(self._objects_per_room):
+                name = f"prop_{r}_{o}"
+                if action_name == 'pickup':
+                    yield name, get_rule({'target':['free']}, {'target':'in_inventory'}, f"You take the {name}.")
+                elif action_name == 'drop':
+                    yield name, get_rule({'target':held}, {'target':'free'}, f"You drop the {name}.")
+                elif action_name in verbs:
+                    yield name, get_rule({'target':held}, {'target':verbs[action_name]}, f"You {action_name} the {name}.")
+            if action_name == 'open':
+                yield f"chest_{r}", get_rule({'target':['free']}, {'target':'opened', 'room':'free'}, f"The chest_{r} gives way.")
+            elif action_name == 'attack':
+                yield f"barrier_{r}", get_rule({'target':['free']}, {'target':'broken', 'room':'free'}, f"The barrier_{r} gives way.")
+                for c in range(self._characters_per_room):
+                    yield f"npc_{r}_{c}", get_rule({'target':['free']}, {'target':'unconscious'}, f"The npc_{r}_{c} crumples.")
+
+    def iter_actions(self):
+        # yields (action name, action) - passive actions are a single rule, the others map targets to rules
+        for action_name in self.get_action_names():
+            if action_name in ['help', 'describe', 'inventory', 'travel']:
+                yield action_name, get_rule({}, {}, None)
+            else:
+                yield action_name, dict(self.iter_action_rules(action_name))
+
+    def iter_commands(self):
+        # yields (command, mapped tokens) for the command map
+        for command in ['help', 'describe', 'look', 'inventory', 'move', 'go', 'pickup', 'get', 'drop', 'open', 'attack']:
+            yield command, {'look':'describe', 'go':'move', 'get':'pickup'}.get(command, command)
+        yield 'go to', 'travel'
+        yield 'travel', 'travel'
+        for direction in DIRECTIONS:
+            yield direction, f"move {direction}"
+        for short, direction in SHORT_DIRECTIONS.items():
+            yield short, f"move {direction}"
+        for verb, state_name in self.get_prop_verbs():
+            yield verb, verb
+        for r in range(self._room_count):
+            yield f"room {r}", [self.get_room_name(r)]
+        for name, game_object in self.iter_game_objects():
+            yield name, name
+
+    # Builds the whole world in memory as (data, commands)
+    def build(self):
+        data = {
+            'world_objects':{'game_objects':dict(self.iter_game_objects()), 'rooms':dict(self.iter_rooms())},
+            'actions':dict(self.iter_actions())}
+        return data, dict(self.iter_commands())
+
+    # Streams the world to disk without holding it in memory - one JSON value per object
+    def write(self, assets_file_name:str, commands_file_name:str) -> None:
+        with open(assets_file_name, 'w') as assets_file:
+            assets_file.write('{"world_objects": {"game_objects": ')
+            write_object(assets_file, self.iter_game_objects())
+            assets_file.write(', "rooms": ')
+            write_object(assets_file, self.iter_rooms())
+            assets_file.write('}, "actions": {')
+            for index, action_name in enumerate(self.get_action_names()):
+                assets_file.write(f"{', ' if index > 0 else ''}{json.dumps(action_name)}: ")
+                if action_name in ['help', 'describe', 'inventory', 'travel']:
+                    assets_file.write(json.dumps(get_rule({}, {}, None)))
+                else:
+                    write_object(assets_file, self.iter_action_rules(action_name))
+            assets_file.write('}}\n')
+        with open(commands_file_name, 'w') as commands_file:
+            write_object(commands_file, self.iter_commands())
+            commands_file.write('\n')
+
+def write_object(output_file, items) -> None:
+    # writes (key, value) pairs as one JSON object, a line per pair
+    output_file.write('{')
+    for index, (key, value) in enumerate(items):
+        output_file.write(f"{',' if index > 0 else ''}\n{json.dumps(key)}: {json.dumps(value)}")
+    output_file.write('\n}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a reproducible world for load testing.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rooms', type=int, default=10)
+    parser.add_argument('--topology', choices=TOPOLOGIES, default='corridor')
+    parser.add_argument('--objects-per-room', type=int, default=10)
+    parser.add_argument('--states', type=int, default=2, help=f"states per prop, 2 to {2 + len(PROP_VERBS)}")
+    parser.add_argument('--characters-per-room', type=int, default=0)
+    parser.add_argument('--words', type=int, default=8, help='filler words per long description')
+    parser.add_argument('--assets', default='generated_assets.json')
+    parser.add_argument('--commands', default='generated_command_map.json')
+    args = parser.parse_args()
+
+    generator = WorldGenerator(args.seed, args.rooms, args.topology, args.objects_per_room, args.states,
+        args.characters_per_room, args.words)
+    generator.write(args.assets, args.commands)
+    print(f"Wrote {generator.get_room_count()} rooms and {generator.get_object_count()} objects to {args.assets}")
+
+if __name__ == '__main__':
+    main()
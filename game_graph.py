@@ -0,0 +1,70 @@
+from collections import deque
+
+class RoomGraph():
+
+    # Constructor - shortest paths between rooms, computed on demand and cached per source room
+    def __init__(self, rooms:dict) -> None:
+        self._rooms = rooms
+        # source room name -> {room name: (distance, previous room name, direction taken)}
+        self._trees = {}
+        for room in rooms.values():
+            room.set_connection_listener(self.on_connections_changed)
+
+    def __get_tree(self, source:str) -> dict:
+        tree = self._trees.get(source)
+        if tree is None:
+            # breadth-first search over the live connections
+            tree = {source:(0, None, None)}
+            queue = deque([source])
+            while len(queue) > 0:
+                room_name = queue.popleft()
+                distance = tree[room_name][0] + 1
+                for direction, next_room_name in self._rooms[room_name].get_connections().items():
+                    if next_room_name not in tree and next_room_name in self._rooms:
+                        tree[next_room_name] = (distance, room_name, direction)
+                        queue.append(next_room_name)
+            self._trees[source] = tree
+        return tree
+
+    # Invalidates only the cached trees that the new connections could shorten or break
+    def on_connections_changed(self, room_name:str, changed:dict) -> None:
+        for source, tree in list(self._trees.items()):
+            if room_name not in tree:
+                continue
+            distance = tree[room_name][0] + 1
+            for direction, next_room_name in changed.items():
+                reached = tree.get(next_room_name)
+                if next_room_name in self._rooms and (reached is None or distance < reached[0]):
+                    del self._trees[source]
+                    break
+                # a redirected passage only matters if the cached tree walked through it
+                if any(v[1] == room_name and v[2] == direction for v in tree.values()):
+                    del self._trees[source]
+                    break
+
+    def invalidate(self) -> None:
+        self._trees.clear()
+
+    # Getter Methods
+    def get_path(self, source:str, target:str) -> list:
+        # [(direction, room name), ...] from source to target, [] if they are the same, None if unreachable
+        tree = self.__get_tree(source)
+        if target not in tree:
+            return None
+        path = []
+        while target != source:
+            distance, previous, direction = tree[target]
+            path.append((direction, target))
+            target = previous
+        path.reverse()
+        return path
+
+    def get_distance(self, source:str, target:str) -> int:
+        tree = self.__get_tree(source)
+        return tree[target][0] if target in tree else None
+
+    def get_reachable_rooms(self, source:str) -> list:
+        return list(self.__get_tree(source).keys())
+
+    def get_cached_source_count(self) -> int:
+        return len(self._trees)
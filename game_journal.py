@@ -0,0 +1,117 @@
+import json
+import os
+
+SNAPSHOT_SUFFIX = '.snapshot'
+
+class GameJournal():
+
+    # Constructor - an append-only journal of one session's events, plus its latest snapshot
+    def __init__(self, journal_file_name:str, fsync_batch:int=32, snapshot_every:int=1000) -> None:
+        self._journal_file_name = journal_file_name
+        self._snapshot_file_name = journal_file_name + SNAPSHOT_SUFFIX
+        self._fsync_batch = fsync_batch
+        self._snapshot_every = snapshot_every
+        self._journal_file = None
+        self._model = None
+        self._unsynced_events = 0
+        self._events_since_snapshot = 0
+
+    # Restores the model from the latest snapshot and the journal tail, then starts journaling it
+    def attach(self, model) -> int:
+        # returns the number of journal events replayed
+        offset = 0
+        if os.path.exists(self._snapshot_file_name):
+            with open(self._snapshot_file_name) as snapshot_file:
+                saved = json.load(snapshot_file)
+            model.apply_delta(saved['snapshot'])
+            offset = saved['offset']
+        replayed, good_offset = self.__replay(model, offset)
+
+        self._journal_file = open(self._journal_file_name, 'ab')
+        # drop a torn final record left by a crash mid-write
+        self._journal_file.truncate(good_offset)
+        self._journal_file.seek(good_offset)
+        self._model = model
+        self._events_since_snapshot = replayed
+        model.set_event_listener(self.append)
+        return replayed
+
+    def __replay(self, model, offset:int) -> tuple:
+        replayed = 0
+        if not os.path.exists(self._journal_file_name):
+            return (replayed, 0)
+        with open(self._journal_file_name, 'rb') as journal_file:
+            journal_file.seek(offset)
+            for line in journal_file:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break
+                model.apply_event(event)
+                offset += len(line)
+                replayed += 1
+        return (replayed, offset)
+
+    # Event listener for GameModel - buffered, fsynced every fsync_batch events
+    def append(self, event:list) -> None:
+        self._journal_file.write(json.dumps(event, separators=(',', ':')).encode() + b'\n')
+        self._unsynced_events += 1
+        self._events_since_snapshot += 1
+        if self._events_since_snapshot >= self._snapshot_every:
+            self.snapshot()
+        elif self._unsynced_events >= self._fsync_batch:
+            self.sync()
+
+    def flush(self) -> None:
+        # hands buffered events to the OS - they survive the process dying, though not the machine
+        if self._journal_file is not None:
+            self._journal_file.flush()
+
+    def sync(self) -> None:
+        if self._journal_file is not None and self._unsynced_events > 0:
+            self._journal_file.flush()
+            os.fsync(self._journal_file.fileno())
+            self._unsynced_events = 0
+
+    # Writes a snapshot of the model so recovery only replays events appended after it
+    def snapshot(self) -> None:
+        self._unsynced_events = max(1, self._unsynced_events)
+        self.sync()
+        saved = {'offset' : self._journal_file.tell(), 'snapshot' : self._model.get_delta()}
+        tmp_file_name = self._snapshot_file_name + '.tmp'
+        with open(tmp_file_name, 'w') as snapshot_file:
+            json.dump(saved, snapshot_file, separators=(',', ':'))
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(tmp_file_name, self._snapshot_file_name)
+        self._events_since_snapshot = 0
+
+    # Moves journaling to a replacement model, e.g. after a hot reload - the snapshot makes the
+    # events already in the journal irrelevant, since they were recorded against the old assets
+    def rebind(self, model) -> None:
+        if self._model is not None:
+            self._model.set_event_listener(None)
+        self._model = model
+        model.set_event_listener(self.append)
+        self.snapshot()
+
+    def close(self) -> None:
+        if self._journal_file is not None:
+            self.sync()
+            self._journal_file.close()
+            self._journal_file = None
+        if self._model is not None:
+            self._model.set_event_listener(None)
+            self._model = None
+
+    # Removes the journal and snapshot files, e.g. when a session ends for good
+    def delete(self) -> None:
+        self.close()
+        for file_name in [self._journal_file_name, self._snapshot_file_name]:
+            if os.path.exists(file_name):
+                os.remove(file_name)
+
+    def get_journal_file_name(self) -> str:
+        return self._journal_file_name
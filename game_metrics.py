@@ -0,0 +1,70 @@
+import json
+import math
+import threading
+
+# histogram buckets are powers of two in microseconds: bucket b counts samples in [2**(b-1), 2**b) us
+BUCKET_COUNT = 32
+
+class LatencyRecorder():
+
+    # Constructor - aggregates per (action, stage) latency histograms, shareable across sessions
+    def __init__(self) -> None:
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, action_name:str, stage:str, seconds:float) -> None:
+        micros = seconds * 1e6
+        bucket = min(BUCKET_COUNT - 1, max(0, math.ceil(math.log2(micros)) if micros > 1 else 0))
+        key = (action_name, stage)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'count':0, 'total_us':0.0, 'max_us':0.0, 'buckets':[0] * BUCKET_COUNT}
+            histogram['count'] += 1
+            histogram['total_us'] += micros
+            histogram['max_us'] = max(histogram['max_us'], micros)
+            histogram['buckets'][bucket] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    # Getter Methods
+    def get_histogram(self, action_name:str, stage:str) -> dict:
+        # a copy of the raw histogram, or None if nothing was recorded for the pair
+        with self._lock:
+            histogram = self._histograms.get((action_name, stage))
+            return None if histogram is None else dict(histogram, buckets=list(histogram['buckets']))
+
+    def get_percentile(self, action_name:str, stage:str, percentile:float) -> float:
+        # upper bound in microseconds of the bucket holding the percentile, capped at the slowest sample
+        histogram = self.get_histogram(action_name, stage)
+        if histogram is None:
+            return None
+        rank = histogram['count'] * percentile / 100
+        seen = 0
+        for bucket, count in enumerate(histogram['buckets']):
+            seen += count
+            if count > 0 and seen >= rank:
+                return min(float(2 ** bucket), histogram['max_us'])
+        return histogram['max_us']
+
+    def get_summary(self) -> dict:
+        # {action: {stage: {count, mean_us, p50_us, p95_us, p99_us, max_us}}}
+        with self._lock:
+            keys = sorted(self._histograms.keys())
+        summary = {}
+        for action_name, stage in keys:
+            histogram = self.get_histogram(action_name, stage)
+            summary.setdefault(action_name, {})[stage] = {
+                'count' : histogram['count'],
+                'mean_us' : histogram['total_us'] / histogram['count'],
+                'p50_us' : self.get_percentile(action_name, stage, 50),
+                'p95_us' : self.get_percentile(action_name, stage, 95),
+                'p99_us' : self.get_percentile(action_name, stage, 99),
+                'max_us' : histogram['max_us']}
+        return summary
+
+    def dump(self, stream) -> None:
+        json.dump(self.get_summary(), stream, indent=2)
+        stream.write('\n')
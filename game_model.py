@@ -1,76 +1,313 @@
+import time
+from types import MappingProxyType
 from game_classes import *
+from game_graph import RoomGraph
 
-class GameModel():
-    _instance = None
-
-    @staticmethod
-    def get_instance(data):
-    	# Used to enforce Singleton
-        if GameModel._instance is None:
-            GameModel(data)
-        return GameModel._instance
-
-    # Constructor
-    def __init__(self, data) -> None:
-        if GameModel._instance is not None:
-            raise Exception("This class is a Singleton")
+def compile_action_rules(data) -> ActionRuleTable:
+    # every object and room name, so rules can tell named objects apart from 'actor'/'target'/'room'
+    world_objects = data['world_objects']
+    names = list(world_objects.get('game_objects').keys()) + list(world_objects.get('rooms').keys())
+    return ActionRuleTable(data['actions'], names)
+
+def migrate_delta(delta:dict, model) -> tuple:
+    # keeps the parts of a delta that still make sense on model (built from newer assets), returning
+    # (delta, dropped) - dropped lists what was left out, e.g. 'states: knife=armed'
+    world_objects = model.get_world_objects()
+    rooms = model.get_rooms()
+    kept = {}
+    dropped = []
+    def keep(key, name, value, is_valid):
+        if is_valid:
+            kept.setdefault(key, {} if key != 'short' else [])
+            if key == 'short':
+                kept[key].append(name)
+            else:
+                kept[key][name] = value
         else:
-            GameModel._instance = self
-            self.__set_available_actions(data['actions'])
-            self.__set_world_objects(data['world_objects'])
-            self.__set_game_objects_to_rooms()
-            self.__set_player_name()
-            self.set_game_over(False)
+            dropped.append(f"{key}: {name}" + ('' if value is None else f"={value}"))
+    for name, state in delta.get('states', {}).items():
+        keep('states', name, state, name in world_objects and world_objects[name].has_state(state))
+    for name in delta.get('short', []):
+        keep('short', name, None, name in world_objects)
+    for key in ['moved', 'relocated']:
+        for name, room_name in delta.get(key, {}).items():
+            keep(key, name, room_name, name in model.get_game_objects() and room_name in rooms)
+    for name, inventory in delta.get('inventories', {}).items():
+        held = [x for x in inventory if x in model.get_items()]
+        for item_name in inventory:
+            if item_name not in held or name not in model.get_characters():
+                dropped.append(f"inventories: {name} holding {item_name}")
+        if name in model.get_characters() and len(held) > 0:
+            kept.setdefault('inventories', {})[name] = held
+    for room_name, connections in delta.get('connections', {}).items():
+        for direction, target in connections.items():
+            is_valid = room_name in rooms and target in rooms
+            if is_valid:
+                kept.setdefault('connections', {}).setdefault(room_name, {})[direction] = target
+            else:
+                dropped.append(f"connections: {room_name} {direction}={target}")
+    if delta.get('game_over'):
+        kept['game_over'] = True
+    return (kept, dropped)
+
+class GameModel():
+
+    # Constructor - one instance per game session, optionally sharing a precompiled ActionRuleTable
+    def __init__(self, data, action_rules=None) -> None:
+        load_start = time.perf_counter()
+        self.__set_registries()
+        self.__set_available_actions(data['actions'])
+        self.__set_action_rules(action_rules or compile_action_rules(data))
+        self.__set_world_objects(data['world_objects'])
+        self.__set_player_name()
+        self._room_graph = RoomGraph(self._rooms)
+        self.set_game_over(False)
+        self.set_event_listener(None)
+        # names of the objects touched since the model was built, in the order first touched - get_delta
+        # only has to look at these, so a save costs O(changes) however large the world is
+        self._changed = {}
+        self._load_time = time.perf_counter() - load_start
 
     # Setter Methods
+    def __set_registries(self) -> None:
+        # typed registries are kept in sync by add/remove so lookups never rescan the world
+        self._world_objects = {}
+        self._game_objects = {}
+        self._characters = {}
+        self._items = {}
+        self._rooms = {}
+        self._registry_views = {
+            'world_objects' : MappingProxyType(self._world_objects),
+            'game_objects' : MappingProxyType(self._game_objects),
+            'characters' : MappingProxyType(self._characters),
+            'items' : MappingProxyType(self._items),
+            'rooms' : MappingProxyType(self._rooms)}
+
     def __set_available_actions(self, available_actions:dict) -> None:
-    	self._available_actions = available_actions
+        self._available_actions = available_actions
+
+    def __set_action_rules(self, action_rules) -> None:
+        self._action_rules = action_rules
 
     def __set_world_objects(self, world_objects:dict) -> None:
-        self._world_objects = {}
-        for obj_type, obj in world_objects.items():
-            for name,x in world_objects.get('game_objects').items():
-                if 'is_playable' in x.keys():
-                    self._world_objects.update(
-                    	{name : Character(name,x['state'],x['starting_room'],x['starting_state'],x['is_playable'])})
-                elif 'is_carryable' in x.keys():
-                    self._world_objects.update(
-                    	{name : Item(name,x['state'],x['starting_room'],x['starting_state'],x['is_carryable'],x['is_equippable'])})
-            for room_name,r in world_objects.get('rooms').items():
-                self._world_objects.update({room_name : Room(room_name,r['state'],r['starting_state'])})
-
-    def __set_game_objects_to_rooms(self) -> None:
-        for obj_name,obj in self.get_game_objects().items():
-            self.get_rooms().get(obj.get_room_name()).set_game_objects({obj_name:obj})
+        # single pass - each object is built once and placed into its room as soon as both exist
+        self._pending_room_objects = {}
+        for name,x in world_objects.get('game_objects').items():
+            if 'is_playable' in x.keys():
+                self.__add_to_room(Character(name,x['state'],x['starting_room'],x['starting_state'],x['is_playable']))
+            elif 'is_carryable' in x.keys():
+                self.__add_to_room(Item(name,x['state'],x['starting_room'],x['starting_state'],x['is_carryable'],x['is_equippable']))
+        for room_name,r in world_objects.get('rooms').items():
+            room = Room(room_name,r['state'],r['starting_state'])
+            self.add_world_object(room)
+            room.set_game_objects(self._pending_room_objects.pop(room_name, {}))
+        if len(self._pending_room_objects) > 0:
+            raise KeyError(f"Unknown starting room(s): {', '.join(self._pending_room_objects)}")
+        del self._pending_room_objects
+
+    def __add_to_room(self, game_object) -> None:
+        # objects whose room has not been loaded yet wait in a pending bucket for that room
+        self.add_world_object(game_object)
+        room = self._rooms.get(game_object.get_room_name())
+        if room is None:
+            self._pending_room_objects.setdefault(game_object.get_room_name(), {})[game_object.get_name()] = game_object
+        else:
+            room.set_game_objects({game_object.get_name():game_object})
 
     def __set_player_name(self) -> None:
-    	# make player name directly available from world class for convenience
-        for name, game_obj in self.get_game_objects().items():
+        # make player name directly available from world class for convenience
+        for name, game_obj in self.get_characters().items():
             if game_obj.get_is_player():
                 self._player_name = name
-    
+
+    def add_world_object(self, world_object) -> None:
+        # replaces any object already registered under the same name
+        name = world_object.get_name()
+        if name in self._world_objects:
+            self.remove_world_object(name)
+        self._world_objects[name] = world_object
+        if isinstance(world_object, GameObject):
+            self._game_objects[name] = world_object
+        if isinstance(world_object, Character):
+            self._characters[name] = world_object
+        if isinstance(world_object, Item):
+            self._items[name] = world_object
+        if isinstance(world_object, Room):
+            self._rooms[name] = world_object
+
+    def remove_world_object(self, name:str) -> None:
+        self._world_objects.pop(name, None)
+        self._game_objects.pop(name, None)
+        self._characters.pop(name, None)
+        self._items.pop(name, None)
+        self._rooms.pop(name, None)
+
     def set_game_over(self, game_over: bool) -> None:
         self._is_game_over = game_over
-    
-    # Getter Methods
+
+    def set_event_listener(self, event_listener) -> None:
+        # called with a compact event list for every game mutation below, e.g. a GameJournal's append
+        self._event_listener = event_listener
+
+    # Mutation Methods - the only way game play changes the world, so every change can be journaled
+    def __mark_changed(self, *names) -> None:
+        for name in names:
+            self._changed[name] = None
+
+    def set_object_state(self, name:str, next_state) -> None:
+        self._world_objects[name].set_current_state(next_state)
+        self.__mark_changed(name)
+        if self._event_listener is not None:
+            self._event_listener(['s', name, next_state])
+
+    def move_character(self, name:str, room_name:str) -> None:
+        # relocates a character, and the items it carries, into another room
+        character = self._world_objects[name]
+        prev_room = self._rooms.get(character.get_room_name())
+        character.set_room_name(room_name)
+        for inv_item_name, inv_item in character.get_inventory().items():
+            inv_item.set_room_name(room_name)
+        if prev_room is not None:
+            prev_room.remove_game_objects(name)
+        self._rooms[room_name].set_game_objects({name:character})
+        self.__mark_changed(name, *character.get_inventory())
+        if self._event_listener is not None:
+            self._event_listener(['m', name, room_name])
+
+    def add_to_inventory(self, character_name:str, item_name:str) -> None:
+        character = self._world_objects[character_name]
+        item = self._world_objects[item_name]
+        item.add_inventory_of(character)
+        character.add_to_inventory({item_name:item})
+        self.__mark_changed(character_name, item_name)
+        if self._event_listener is not None:
+            self._event_listener(['i', character_name, item_name, 1])
+
+    def remove_from_inventory(self, character_name:str, item_name:str) -> None:
+        item = self._world_objects[item_name]
+        item.remove_inventory_of()
+        self._world_objects[character_name].remove_from_inventory({item_name:item})
+        self.__mark_changed(character_name, item_name)
+        if self._event_listener is not None:
+            self._event_listener(['i', character_name, item_name, 0])
+
+    def show_description(self, name:str) -> str:
+        # returns an object's description - showing a long one switches it to short, so that is journaled too
+        world_object = self._world_objects[name]
+        if world_object.get_description_length() == 'long':
+            self.__mark_changed(name)
+            if self._event_listener is not None:
+                self._event_listener(['d', name])
+        return world_object.get_description()
+
+    def reset_connections(self, room_name:str, connections:dict) -> None:
+        # rewinds a room's passages, e.g. when a solver backtracks - not a game play event, so never journaled
+        self._rooms[room_name].reset_connections(connections)
+        self._room_graph.invalidate()
+        self.__mark_changed(room_name)
+
+    def apply_event(self, event:list) -> None:
+        # replays an event produced by the mutation methods above
+        if event[0] == 's':
+            self.set_object_state(event[1], event[2])
+        elif event[0] == 'm':
+            self.move_character(event[1], event[2])
+        elif event[0] == 'i' and event[3]:
+            self.add_to_inventory(event[1], event[2])
+        elif event[0] == 'i':
+            self.remove_from_inventory(event[1], event[2])
+        elif event[0] == 'd':
+            self._world_objects[event[1]].set_description_length('short')
+            self.__mark_changed(event[1])
+        else:
+            raise ValueError(f"Unknown event: {event}")
+
+    # Delta Methods - only what differs from the starting world, as plain JSON-compatible data
+    def get_delta(self) -> dict:
+        delta = {}
+        changed = [(k, self._world_objects[k]) for k in self._changed if k in self._world_objects]
+        game_objects = [(k,v) for k,v in changed if k in self._game_objects]
+        rooms = [(k,v) for k,v in changed if k in self._rooms]
+        states = {k:v.get_current_state() for k,v in changed if v.get_current_state() != v.get_starting_state()}
+        # sorted, so identical worlds give identical deltas whatever order their descriptions were shown in
+        short = sorted(k for k,v in changed if v.get_description_length() != 'long')
+        moved = {k:v.get_room_name() for k,v in game_objects if v.get_room_name() != v.get_starting_room_name()}
+        # objects whose room listing changed - only characters relocated by move_character
+        relocated = {k:v.get_room_name() for k,v in game_objects if v.get_room_name() != v.get_starting_room_name()
+                     and k in self._rooms[v.get_room_name()].get_game_objects()}
+        inventories = {k:list(v.get_inventory().keys()) for k,v in changed if k in self._characters and len(v.get_inventory()) > 0}
+        # connections left over from earlier room states, beyond what the current state provides
+        connections = {}
+        for room_name, room in rooms:
+            defined = dict(room.get_state_connections(room.get_starting_state()))
+            defined.update(room.get_state_connections(room.get_current_state()))
+            extra = {k:v for k,v in room.get_connections().items() if defined.get(k) != v}
+            if len(extra) > 0:
+                connections[room_name] = extra
+        for key, value in [('states', states), ('short', short), ('moved', moved), ('relocated', relocated),
+                           ('inventories', inventories), ('connections', connections)]:
+            if len(value) > 0:
+                delta[key] = value
+        if self._is_game_over:
+            delta['game_over'] = True
+        return delta
+
+    def apply_delta(self, delta:dict) -> None:
+        # restores a delta onto a model freshly built from the same assets; emits no events
+        for name, current_state in delta.get('states', {}).items():
+            self._world_objects[name].set_current_state(current_state)
+            self.__mark_changed(name)
+        for name in delta.get('short', []):
+            self._world_objects[name].set_description_length('short')
+            self.__mark_changed(name)
+        for name, room_name in delta.get('moved', {}).items():
+            self._game_objects[name].set_room_name(room_name)
+            self.__mark_changed(name)
+        for name, room_name in delta.get('relocated', {}).items():
+            game_object = self._game_objects[name]
+            self._rooms[game_object.get_starting_room_name()].remove_game_objects(name)
+            self._rooms[room_name].set_game_objects({name:game_object})
+            self.__mark_changed(name)
+        for character_name, inventory in delta.get('inventories', {}).items():
+            character = self._characters[character_name]
+            for item_name in inventory:
+                self._items[item_name].add_inventory_of(character)
+                character.add_to_inventory({item_name:self._items[item_name]})
+            self.__mark_changed(character_name, *inventory)
+        for room_name, connections in delta.get('connections', {}).items():
+            self._rooms[room_name].set_connections(connections)
+            self.__mark_changed(room_name)
+        self.set_game_over(delta.get('game_over', False))
+
+    # Getter Methods - registries are returned as read-only views
     def get_world_objects(self) -> dict:
-        return self._world_objects
+        return self._registry_views['world_objects']
 
     def get_game_objects(self) -> dict:
-        return {k:v for k,v in self._world_objects.items() if isinstance(v,GameObject)}
+        return self._registry_views['game_objects']
 
     def get_characters(self) -> dict:
-        return {k:v for k,v in self._world_objects.items() if isinstance(v,Character)}
+        return self._registry_views['characters']
 
     def get_items(self) -> dict:
-        return {k:v for k,v in self._world_objects.items() if isinstance(v,Item)}
+        return self._registry_views['items']
 
     def get_rooms(self) -> dict:
-        return {k:v for k,v in self._world_objects.items() if isinstance(v,Room)}
+        return self._registry_views['rooms']
 
     def get_available_actions(self) -> dict:
         return self._available_actions
 
+    def get_load_time(self) -> float:
+        # seconds spent building the world in the constructor
+        return self._load_time
+
+    def get_room_graph(self):
+        return self._room_graph
+
+    def get_action_rules(self):
+        return self._action_rules
+
     def get_player_name(self) -> str:
         return self._player_name
 
@@ -0,0 +1,74 @@
+import functools
+import sys
+
+# filler words that may appear anywhere in a command without changing its meaning
+IGNORED_TOKENS = ('a', 'an', 'the', 'at', 'to', 'on', 'from', 'with', 'into', 'up')
+
+# trie node key marking the end of an alias, e.g. the trie path 'pick' -> 'up' -> END
+END = ''
+
+class CommandParser():
+
+    # Constructor - compiles the command map into a token trie once
+    def __init__(self, command_map:dict, ignored_tokens=IGNORED_TOKENS, cache_size:int=4096) -> None:
+        self._trie = {}
+        self._pairs = {}
+        self._ignored_tokens = frozenset(ignored_tokens)
+        for alias, mapped in command_map.items():
+            self.__add_alias(alias, mapped)
+        # bounded memo of whole input lines - players repeat the same few commands constantly
+        self.parse = functools.lru_cache(maxsize=cache_size)(self.__parse)
+
+    def __add_alias(self, alias:str, mapped) -> None:
+        # mapped is either a string of words ("move north") or a list of literal tokens (["Room 1"])
+        words = mapped.split() if isinstance(mapped, str) else mapped
+        node = self._trie
+        for word in alias.lower().split():
+            node = node.setdefault(sys.intern(word), {})
+        node[END] = tuple(sys.intern(x) for x in words)
+
+    def __get_pair(self, action_name:str, target_name:str) -> tuple:
+        # interned (action, target) pair shared by every command resolving to it
+        pair = (action_name, target_name)
+        return self._pairs.setdefault(pair, pair)
+
+    # Returns (response, (action_name, target_name)) where response is 'success', '' or an error code
+    def __parse(self, command:str) -> tuple:
+        if command is None:
+            return ('', None)
+        words = command.lower().split()
+        action_name = None
+        target_name = None
+        idx = 0
+        while idx < len(words):
+            # longest alias starting at this word wins, e.g. 'pick up' over 'pick'
+            node = self._trie
+            mapped = None
+            end = idx
+            while end < len(words) and words[end] in node:
+                node = node[words[end]]
+                end += 1
+                if END in node:
+                    mapped = node[END]
+                    match_end = end
+            if mapped is None:
+                if words[idx] in self._ignored_tokens:
+                    idx += 1
+                    continue
+                return ('error action' if action_name is None else 'error target', None)
+            # duplicate tokens collapse, so 'go north' and 'north' both mean ('move', 'north')
+            for token in mapped:
+                if action_name is None:
+                    action_name = token
+                elif target_name is None and token != action_name:
+                    target_name = token
+            idx = match_end
+        if action_name is None:
+            return ('', None)
+        return ('success', self.__get_pair(action_name, target_name))
+
+    def get_cache_info(self):
+        return self.parse.cache_info()
+
+    def clear_cache(self) -> None:
+        self.parse.cache_clear()
@@ -0,0 +1,137 @@
+import threading
+from types import MappingProxyType
+from game_assets import GameAssets
+from game_bundle import get_source_info, load_game_data
+from game_model import GameModel
+from game_text import resolve_text
+
+# Hot reload of asset packs - an AssetWatcher polls the asset, command map and response files and, when
+# one changes, rebuilds GameAssets in the background (recompiling the bundle) and swaps them into a
+# GameSessionManager. Each live session is migrated under its own lock, so a command sees either the old
+# world or the new one, never a mix; object states that no longer exist are dropped.
+
+def thaw(value):
+    # plain, comparable data from frozen assets - TextRefs are resolved to their text
+    if isinstance(value, MappingProxyType):
+        return {k:thaw(v) for k,v in value.items()}
+    elif isinstance(value, tuple):
+        return [thaw(x) for x in value]
+    return resolve_text(value)
+
+def diff_mappings(old, new) -> dict:
+    # {'added': [...], 'removed': [...], 'changed': [...]} by key, each sorted
+    return {
+        'added' : sorted(k for k in new if k not in old),
+        'removed' : sorted(k for k in old if k not in new),
+        'changed' : sorted(k for k in new if k in old and thaw(new[k]) != thaw(old[k]))}
+
+def diff_assets(old, new) -> dict:
+    # what a reload changes between two GameAssets, e.g.
+    # {'game_objects': {...}, 'rooms': {...}, 'states': {'knife': {'added': [...], ...}}, 'actions': {...}, ...}
+    report = {}
+    old_objects = old.get_data().get('world_objects', {})
+    new_objects = new.get_data().get('world_objects', {})
+    states = {}
+    for group in sorted(set(old_objects) | set(new_objects)):
+        old_group = old_objects.get(group, {})
+        new_group = new_objects.get(group, {})
+        report[group] = diff_mappings(old_group, new_group)
+        for name in report[group]['changed']:
+            changes = diff_mappings(old_group[name].get('state', {}), new_group[name].get('state', {}))
+            if any(len(x) > 0 for x in changes.values()):
+                states[name] = changes
+    report['states'] = states
+    report['actions'] = diff_mappings(old.get_data().get('actions', {}), new.get_data().get('actions', {}))
+    report['commands'] = diff_mappings(old.get_commands(), new.get_commands())
+    report['responses'] = diff_mappings(old.get_responses(), new.get_responses())
+    return report
+
+def format_report(report:dict, dropped:dict=None) -> str:
+    # one line per kind of change, then the state each migrated session lost, if any
+    lines = []
+    for key, changes in report.items():
+        if key == 'states':
+            for name, state_changes in changes.items():
+                lines += [f"states of {name} {k}: {', '.join(v)}" for k,v in state_changes.items() if len(v) > 0]
+        else:
+            lines += [f"{key} {k}: {', '.join(v)}" for k,v in changes.items() if len(v) > 0]
+    if len(lines) == 0:
+        lines.append('no changes')
+    for session_id, lost in (dropped or {}).items():
+        lines.append(f"session {session_id} dropped: {', '.join(lost)}")
+    return '\n'.join(lines)
+
+
+
+
+
+class AssetWatcher():
+
+    # Constructor - watches file_names (assets, command map, responses) every interval seconds
+    # on_reload(report, dropped) is called after each successful swap, e.g. to log format_report
+    def __init__(self, manager, file_names:tuple, interval:float=1.0, on_reload=None) -> None:
+        self._manager = manager
+        self._file_names = file_names
+        self._interval = interval
+        self._on_reload = on_reload
+        self._source_info = self.__get_source_info()
+        self._last_report = None
+        self._last_error = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __get_source_info(self):
+        # None while a file is missing, e.g. halfway through an editor's save
+        try:
+            return [get_source_info(x) for x in self._file_names]
+        except OSError:
+            return None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.__run, daemon=True, name='asset-watcher')
+        self._thread.start()
+
+    def stop(self, timeout:float=None) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            self.check()
+
+    # Reloads if any watched file changed since the last check; returns whether assets were swapped
+    def check(self) -> bool:
+        source_info = self.__get_source_info()
+        if source_info is None or source_info == self._source_info:
+            return False
+        self._source_info = source_info
+        return self.reload()
+
+    # Loads the watched files and swaps them in - a pack that fails to load leaves the old assets in place
+    def reload(self) -> bool:
+        try:
+            assets = GameAssets(*load_game_data(*self._file_names))
+            # build one world up front, so a broken pack fails here rather than halfway through the sessions
+            GameModel(assets.get_data(), assets.get_action_rules())
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            self._last_error = e
+            return False
+        self._last_error = None
+        report = diff_assets(self._manager.get_assets(), assets)
+        dropped = self._manager.set_assets(assets)
+        self._last_report = report
+        if self._on_reload is not None:
+            self._on_reload(report, dropped)
+        return True
+
+    # Getter Methods
+    def get_last_report(self) -> dict:
+        return self._last_report
+
+    def get_last_error(self):
+        return self._last_error
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
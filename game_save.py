@@ -0,0 +1,22 @@
+import json
+import os
+
+# Save games hold only the delta from the starting world (see GameModel.get_delta), so they stay
+# a few hundred bytes regardless of world size and can be written every turn.
+
+def save_game(model, save_file_name:str, durable:bool=False) -> int:
+    # writes the save atomically and returns its size in bytes; durable also fsyncs it
+    payload = json.dumps(model.get_delta(), separators=(',', ':')).encode()
+    tmp_file_name = f"{save_file_name}.{os.getpid()}.tmp"
+    with open(tmp_file_name, 'wb') as save_file:
+        save_file.write(payload)
+        if durable:
+            save_file.flush()
+            os.fsync(save_file.fileno())
+    os.replace(tmp_file_name, save_file_name)
+    return len(payload)
+
+def load_game(model, save_file_name:str) -> None:
+    # the model must be freshly built from the same assets the save was made with
+    with open(save_file_name, 'rb') as save_file:
+        model.apply_delta(json.loads(save_file.read()))
@@ -0,0 +1,220 @@
+import os
+import threading
+import time
+import uuid
+from urllib.parse import quote, unquote
+from game_journal import GameJournal
+from game_save import save_game, load_game
+from game_model import *
+from game_view import *
+from game_controller import *
+
+JOURNAL_SUFFIX = '.journal'
+
+class GameSession():
+
+    # Constructor - a session owns its own model/view/controller triple over shared GameAssets
+    # its output goes to sink, e.g. a BufferSink or SocketSink, or to stdout by default
+    def __init__(self, session_id:str, assets, headless:bool=False, latency_recorder=None, sink=None) -> None:
+        self._session_id = session_id
+        self._assets = assets
+        self._game_model = GameModel(assets.get_data(), assets.get_action_rules())
+        self._game_view = GameView(assets.get_commands(), assets.get_responses(), headless, sink)
+        self._game_controller = GameController(self._game_model, self._game_view, assets.get_command_parser())
+        self._game_controller.set_latency_recorder(latency_recorder)
+        self._journal = None
+        # held by everything that reads or changes the world (commands, saves, loads, journaling), so a
+        # hot reload never swaps the world out from under it
+        self._lock = threading.Lock()
+        self._created_time = time.time()
+        self.touch()
+
+    # Setter Methods
+    def touch(self) -> None:
+        self._last_active_time = time.time()
+
+    def set_journal(self, journal) -> int:
+        # recovers the session from the journal's snapshot and tail, then journals every change
+        with self._lock:
+            self._journal = journal
+            return journal.attach(self._game_model)
+
+    def close_journal(self, delete:bool=False) -> None:
+        with self._lock:
+            if self._journal is not None:
+                if delete:
+                    self._journal.delete()
+                else:
+                    self._journal.close()
+                self._journal = None
+
+    # Getter Methods
+    def get_session_id(self) -> str:
+        return self._session_id
+
+    def get_assets(self):
+        return self._assets
+
+    def get_model(self):
+        return self._game_model
+
+    def get_view(self):
+        return self._game_view
+
+    def get_controller(self):
+        return self._game_controller
+
+    def get_journal(self):
+        return self._journal
+
+    def get_created_time(self) -> float:
+        return self._created_time
+
+    def get_last_active_time(self) -> float:
+        return self._last_active_time
+
+    # Writes a delta save of this session's world, returning its size in bytes
+    def save_game(self, save_file_name:str, durable:bool=False) -> int:
+        with self._lock:
+            return save_game(self._game_model, save_file_name, durable)
+
+    # Restores a delta save - only valid on a session that has not played any commands yet
+    def load_game(self, save_file_name:str) -> None:
+        with self._lock:
+            load_game(self._game_model, save_file_name)
+
+    # Runs one command through the controller and returns its response code
+    def try_parse(self, command:str) -> str:
+        self.touch()
+        with self._lock:
+            return self._game_controller.try_parse(command)
+
+    # Runs one command and renders its response into the session's view, returning the response code
+    def run_command(self, command:str) -> str:
+        self.touch()
+        with self._lock:
+            response = self._game_controller.try_parse(command)
+            self._game_controller.print_response(response)
+            return response
+
+    # Rebuilds the session on new GameAssets, keeping every change that still fits the new definitions
+    # returns the parts of the world that had to be dropped (see migrate_delta)
+    def migrate(self, assets) -> list:
+        with self._lock:
+            model = GameModel(assets.get_data(), assets.get_action_rules())
+            delta, dropped = migrate_delta(self._game_model.get_delta(), model)
+            model.apply_delta(delta)
+            self._game_view.skip_output()
+            view = GameView(assets.get_commands(), assets.get_responses(), self._game_view.is_headless(), self._game_view.get_sink())
+            controller = GameController(model, view, assets.get_command_parser())
+            controller.set_latency_recorder(self._game_controller.get_latency_recorder())
+            if self._journal is not None:
+                self._journal.rebind(model)
+            self._assets = assets
+            self._game_model = model
+            self._game_view = view
+            self._game_controller = controller
+        return dropped
+
+
+
+
+
+class GameSessionManager():
+
+    # Constructor - every session created here shares the same frozen GameAssets (and LatencyRecorder, if any)
+    # with a journal_dir, each session is journaled to <journal_dir>/<session id>.journal
+    def __init__(self, assets, headless:bool=False, latency_recorder=None, journal_dir:str=None) -> None:
+        self._assets = assets
+        self._headless = headless
+        self._latency_recorder = latency_recorder
+        self._journal_dir = journal_dir
+        self._sessions = {}
+        self._lock = threading.Lock()
+        if journal_dir is not None:
+            os.makedirs(journal_dir, exist_ok=True)
+
+    def create_session(self, session_id:str=None, sink=None) -> GameSession:
+        # an id with an existing journal resumes that game where it left off
+        if session_id is None:
+            session_id = uuid.uuid4().hex
+        if session_id in self._sessions:
+            raise KeyError(f"Session '{session_id}' already exists")
+        session = GameSession(session_id, self._assets, self._headless, self._latency_recorder, sink)
+        if self._journal_dir is not None:
+            session.set_journal(GameJournal(self.get_journal_file_name(session_id)))
+        with self._lock:
+            if session_id in self._sessions:
+                session.close_journal()
+                raise KeyError(f"Session '{session_id}' already exists")
+            self._sessions[session_id] = session
+        return session
+
+    def recover_sessions(self) -> list:
+        # reloads every journaled session in journal_dir that is not already running, returning their ids
+        recovered = []
+        if self._journal_dir is None or not os.path.isdir(self._journal_dir):
+            return recovered
+        for file_name in sorted(os.listdir(self._journal_dir)):
+            if file_name.endswith(JOURNAL_SUFFIX):
+                session_id = unquote(file_name[:-len(JOURNAL_SUFFIX)])
+                if session_id not in self._sessions:
+                    self.create_session(session_id)
+                    recovered.append(session_id)
+        return recovered
+
+    def get_journal_file_name(self, session_id:str) -> str:
+        return os.path.join(self._journal_dir, quote(session_id, safe='') + JOURNAL_SUFFIX)
+
+    def get_session(self, session_id:str) -> GameSession:
+        # returns None for unknown sessions
+        return self._sessions.get(session_id)
+
+    def destroy_session(self, session_id:str, keep_journal:bool=False) -> GameSession:
+        # returns the removed session, or None if it did not exist - its journal is deleted unless kept
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.close_journal(delete=not keep_journal)
+        return session
+
+    def destroy_idle_sessions(self, max_idle_seconds:float, keep_journal:bool=True) -> list:
+        # unload every session that has not run a command recently, returning their ids
+        # journals are kept by default so an idle player can resume later
+        cutoff = time.time() - max_idle_seconds
+        with self._lock:
+            idle = [k for k,v in self._sessions.items() if v.get_last_active_time() < cutoff]
+            sessions = [self._sessions.pop(x) for x in idle]
+        for session in sessions:
+            session.close_journal(delete=not keep_journal)
+        return idle
+
+    def close(self) -> None:
+        # flushes and closes every journal without deleting anything, e.g. on shutdown
+        for session in list(self._sessions.values()):
+            session.close_journal()
+
+    def get_assets(self):
+        return self._assets
+
+    # Swaps in new GameAssets - new sessions use them at once, live sessions are migrated one at a time
+    # returns {session id: dropped changes} for every session that lost something
+    def set_assets(self, assets) -> dict:
+        with self._lock:
+            self._assets = assets
+            sessions = list(self._sessions.values())
+        dropped = {}
+        for session in sessions:
+            lost = session.migrate(assets)
+            if len(lost) > 0:
+                dropped[session.get_session_id()] = lost
+        return dropped
+
+    def get_latency_recorder(self):
+        return self._latency_recorder
+
+    def get_session_ids(self) -> list:
+        return list(self._sessions.keys())
+
+    def get_session_count(self) -> int:
+        return len(self._sessions)
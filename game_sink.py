@@ -0,0 +1,168 @@
+import os
+import sys
+
+# Output sinks for GameView - writes are buffered until flush, which GameView calls once per
+# command response, so each response reaches the destination as a single write.
+
+def supports_ansi(stream) -> bool:
+    # whether stream is an interactive terminal that understands ANSI escape sequences
+    isatty = getattr(stream, 'isatty', None)
+    if isatty is None or not isatty():
+        return False
+    if os.environ.get('TERM') == 'dumb':
+        return False
+    if os.name == 'nt':
+        return enable_windows_ansi(stream)
+    return True
+
+def enable_windows_ansi(stream) -> bool:
+    # Windows 10+ consoles handle escape sequences once virtual terminal processing is switched on
+    try:
+        import ctypes
+        import msvcrt
+        kernel32 = ctypes.windll.kernel32
+        handle = msvcrt.get_osfhandle(stream.fileno())
+        mode = ctypes.c_uint32()
+        if not kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+            return False
+        # ENABLE_VIRTUAL_TERMINAL_PROCESSING
+        return bool(mode.value & 0x0004) or bool(kernel32.SetConsoleMode(handle, mode.value | 0x0004))
+    except (ImportError, AttributeError, OSError, ValueError):
+        return False
+
+class OutputSink():
+
+    # Constructor - subclasses implement emit() to send one coalesced chunk of text on
+    def __init__(self) -> None:
+        self._pending = []
+
+    def write(self, text:str) -> None:
+        self._pending.append(text)
+
+    def flush(self) -> None:
+        if len(self._pending) > 0:
+            text = ''.join(self._pending)
+            self._pending = []
+            self.emit(text)
+
+    def emit(self, text:str) -> None:
+        # to be overriden by subclasses
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+    def supports_ansi(self) -> bool:
+        # whether escape sequences (e.g. clearing the screen) reach a terminal - never for files and sockets
+        return False
+
+
+
+
+
+class StreamSink(OutputSink):
+
+    # Constructor - a text stream, or whatever sys.stdout is at the time of each flush
+    # (so contextlib.redirect_stdout keeps working)
+    def __init__(self, stream=None) -> None:
+        super().__init__()
+        self._stream = stream
+
+    def get_stream(self):
+        return self._stream if self._stream is not None else sys.stdout
+
+    def emit(self, text:str) -> None:
+        stream = self.get_stream()
+        stream.write(text)
+        stream.flush()
+
+    def supports_ansi(self) -> bool:
+        return supports_ansi(self.get_stream())
+
+
+
+
+
+class NullSink(OutputSink):
+
+    # Throws every response away as it is written, e.g. for benchmark runs without a transcript
+    def write(self, text:str) -> None:
+        pass
+
+
+
+
+
+class BufferSink(OutputSink):
+
+    # Constructor - keeps every response in memory, e.g. to return it from a server
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks = []
+
+    def emit(self, text:str) -> None:
+        self._chunks.append(text)
+
+    def getvalue(self) -> str:
+        return ''.join(self._chunks)
+
+    # Returns everything written since the last read
+    def read(self) -> str:
+        self.flush()
+        text = ''.join(self._chunks)
+        self._chunks = []
+        return text
+
+
+
+
+
+class FileSink(OutputSink):
+
+    # Constructor - appends to a file, e.g. a per-session transcript
+    def __init__(self, file_name:str, mode:str='a', encoding:str='utf-8') -> None:
+        super().__init__()
+        self._file = open(file_name, mode, encoding=encoding)
+
+    def emit(self, text:str) -> None:
+        self._file.write(text)
+        self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            super().close()
+            self._file.close()
+
+
+
+
+
+class SocketSink(OutputSink):
+
+    # Constructor - a connected socket; each response goes out in one sendall
+    def __init__(self, sock, encoding:str='utf-8') -> None:
+        super().__init__()
+        self._socket = sock
+        self._encoding = encoding
+
+    def emit(self, text:str) -> None:
+        self._socket.sendall(text.encode(self._encoding))
+
+
+
+
+
+class AsyncStreamSink(OutputSink):
+
+    # Constructor - an asyncio StreamWriter; flush only queues the bytes, await drain() for backpressure
+    def __init__(self, writer, encoding:str='utf-8') -> None:
+        super().__init__()
+        self._writer = writer
+        self._encoding = encoding
+
+    def emit(self, text:str) -> None:
+        self._writer.write(text.encode(self._encoding))
+
+    async def drain(self) -> None:
+        self.flush()
+        await self._writer.drain()
@@ -0,0 +1,520 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from game_assets import GameAssets
+from game_bundle import load_game_data
+from game_controller import GameController
+from game_model import GameModel
+
+# Explores every world state reachable from the starting world by applying the real action rules,
+# to check that the endings can be reached and to find states from which they cannot.
+
+DEFAULT_GOALS = ['Room 9:betray_self', 'Room 9:betray_other', 'Room 9:forgive']
+
+# a bound on the search - items can be dropped in any room, so the full state space grows exponentially
+DEFAULT_MAX_STATES = 25000
+
+# actions that never change the world (or, like travel, are made of other actions)
+PASSIVE_ACTIONS = ['help', 'inventory', 'describe', 'say', 'travel']
+
+def to_key(state):
+    # states are normally strings, but a rule can set a list - keys need hashable values
+    return tuple(state) if isinstance(state, list) else state
+
+def from_key(state):
+    return list(state) if isinstance(state, tuple) else state
+
+def get_frozen_states(model, candidates:list) -> dict:
+    # {name: states} for game objects that can never leave those states - no rule targeting the object
+    # accepts them and nothing else sets its state - so where such an object lies never matters again
+    accepted = {}
+    # the actor's state is set by rules on any target, and the controller moves the book along with the player
+    updated = {model.get_player_name(), 'book'}
+    for rule in candidates:
+        target_states = rule.get_req_state().get('target')
+        if target_states is None:
+            accepted[rule.get_target_name()] = None
+        elif accepted.get(rule.get_target_name(), ()) is not None:
+            accepted.setdefault(rule.get_target_name(), set()).update(target_states)
+        updated.update(name for kind, name, state in rule.get_state_updates() if kind == 'object')
+    frozen = {}
+    for name, game_object in model.get_game_objects().items():
+        if name not in updated and (name not in accepted or accepted[name] is not None):
+            frozen[name] = frozenset(x for x in game_object.get_state_names() if x not in accepted.get(name, ()))
+    return frozen
+
+def get_event_names(events:list, model) -> set:
+    # the world objects a command's events touched - a move also moves whatever the character carries
+    names = set()
+    for event in events:
+        if event[0] == 'd':
+            continue
+        names.add(event[1])
+        if event[0] == 'i':
+            names.add(event[2])
+        elif event[0] == 'm':
+            names.update(model.get_world_objects()[event[1]].get_inventory())
+    return names
+
+def get_updated_names(model, rule, kind:str, name:str) -> list:
+    # the world objects one of a rule's state updates may set - a room update sets whichever room the player is in
+    if kind == 'object':
+        return [name]
+    elif kind == 'target':
+        return [rule.get_target_name()]
+    elif kind == 'actor':
+        return [model.get_player_name()]
+    return list(model.get_rooms().keys())
+
+def get_produced_states(model, candidates:list) -> dict:
+    # {name: states} the candidate rules can set each world object to
+    rooms = list(model.get_rooms().keys())
+    produced = {}
+    for rule in candidates:
+        for kind, name, state in rule.get_state_updates():
+            for x in get_updated_names(model, rule, kind, name):
+                produced.setdefault(x, set()).add(to_key(state))
+    # the controller itself moves the book along with the player
+    if 'book' in model.get_world_objects():
+        produced.setdefault('book', set()).update(f"inventory {x}" for x in rooms)
+    return produced
+
+def get_rule_writes(model, candidates:list) -> list:
+    # [(rule, {part written: parts it is computed from}), ...] where a part is ('state', name), ('position', name),
+    # ('inventory', name) - whether the player carries it - or ('passages', room name)
+    player_name = model.get_player_name()
+    game_objects = model.get_game_objects()
+    rooms = list(model.get_rooms().keys())
+    writes = []
+    for rule in candidates:
+        if rule.get_action_name() == 'move':
+            enabled_by = {('position', player_name)} | {('passages', x) for x in rooms}
+            written = {('position', player_name) : enabled_by}
+            # whatever the player carries moves along, and the controller moves the book
+            written.update({('position', x) : enabled_by | {('inventory', x)} for x in game_objects})
+            if 'book' in model.get_world_objects():
+                written[('state', 'book')] = enabled_by
+            writes.append((rule, written))
+            continue
+        target_name = rule.get_target_name()
+        enabled_by = {('position', player_name)}
+        if target_name in game_objects:
+            enabled_by.add(('position', target_name))
+        if rule.get_req_state().get('actor') is not None:
+            enabled_by.add(('state', player_name))
+        if rule.get_req_state().get('target') is not None:
+            enabled_by.add(('state', target_name))
+        written = {}
+        for kind, name, state in rule.get_state_updates():
+            for x in get_updated_names(model, rule, kind, name):
+                written[('state', x)] = enabled_by
+                if x in model.get_rooms():
+                    written[('passages', x)] = enabled_by
+        if target_name in game_objects:
+            written[('inventory', target_name)] = enabled_by | {('state', target_name)}
+        writes.append((rule, written))
+    return writes
+
+def get_relevant_parts(writes:list, goal_names=(), settled=frozenset()) -> tuple:
+    # (rules, parts) - the rules that can still influence a goal object's state and the parts of the world they
+    # read, given writes from get_rule_writes and the settled objects, whose states no rule can change any more
+    # other rules only change parts that no goal depends on, so leaving them out keeps every goal's reachability
+    live = [(rule, {k:v for k,v in written.items() if k[0] in ('position', 'inventory') or k[1] not in settled})
+            for rule, written in writes]
+    parts = {('state', x) for x in goal_names}
+    size = 0
+    while size != len(parts):
+        size = len(parts)
+        for rule, written in live:
+            for part, read in written.items():
+                if part in parts:
+                    parts.update(read)
+    return ([rule for rule, written in live if any(x in parts for x in written)], parts)
+
+class StateCodec():
+
+    # Constructor - a key holds the parts of the world that can still influence a goal (see get_relevant_parts)
+    # and None for the rest: once an object is in the only state any rule sets it to, writing it changes nothing,
+    # so whatever only mattered through those writes is merged away. Positions are also left out while an
+    # object is frozen in its state, and passages are only kept for rooms whose states define different ones
+    def __init__(self, model, candidates:list, goal_names=()) -> None:
+        self._writes = get_rule_writes(model, candidates)
+        self._goal_names = goal_names
+        rules, parts = get_relevant_parts(self._writes, goal_names)
+        # a room's state sets its passages
+        self._state_names = tuple(x for x in model.get_world_objects() if ('state', x) in parts or ('passages', x) in parts)
+        self._position_names = tuple(x for x in model.get_game_objects() if ('position', x) in parts)
+        self._character_names = tuple(model.get_characters().keys())
+        self._room_names = tuple(k for k,v in model.get_rooms().items() if ('passages', k) in parts
+            and len({frozenset(v.get_state_connections(x).items()) for x in v.get_state_names()}) > 1)
+        self._frozen_states = get_frozen_states(model, rules)
+        # name -> index, for each of the four parts of a key
+        self._indices = tuple({x:i for i,x in enumerate(names)}
+            for names in (self._state_names, self._position_names, self._character_names, self._room_names))
+        # (state index, state) of objects every rule sets to the same state - kept in every key
+        produced = get_produced_states(model, rules)
+        self._settling = tuple((i, next(iter(produced[x]))) for i,x in enumerate(self._state_names)
+            if len(produced.get(x, ())) == 1)
+        # settled names -> (rules, state mask, position mask, carried names, room mask)
+        self._relevance = {}
+
+    def __get_relevance(self, states:tuple) -> tuple:
+        settled = frozenset(self._state_names[i] for i, state in self._settling if states[i] == state)
+        relevance = self._relevance.get(settled)
+        if relevance is None:
+            rules, parts = get_relevant_parts(self._writes, self._goal_names, settled)
+            settling = {i for i, state in self._settling}
+            relevance = (rules,
+                tuple(i in settling or ('state', x) in parts for i,x in enumerate(self._state_names)),
+                tuple(('position', x) in parts for x in self._position_names),
+                frozenset(name for kind, name in parts if kind == 'inventory'),
+                tuple(('passages', x) in parts for x in self._room_names))
+            self._relevance[settled] = relevance
+        return relevance
+
+    def __get_position(self, game_object):
+        if to_key(game_object.get_current_state()) in self._frozen_states.get(game_object.get_name(), ()):
+            return None
+        return game_object.get_room_name()
+
+    def __mask(self, states, positions, inventories, connections, game_over) -> tuple:
+        # the key with None for everything that can no longer influence a goal
+        rules, state_mask, position_mask, carried, room_mask = self.__get_relevance(states)
+        return (
+            tuple(x if m else None for x,m in zip(states, state_mask)),
+            tuple(x if m else None for x,m in zip(positions, position_mask)),
+            tuple(carried.intersection(x) for x in inventories),
+            tuple(x if m else None for x,m in zip(connections, room_mask)),
+            game_over)
+
+    # Returns a hashable key for everything that affects play - description lengths are ignored
+    def encode(self, model) -> tuple:
+        world_objects = model.get_world_objects()
+        return self.__mask(
+            tuple(to_key(world_objects[x].get_current_state()) for x in self._state_names),
+            tuple(self.__get_position(world_objects[x]) for x in self._position_names),
+            tuple(frozenset(world_objects[x].get_inventory()) for x in self._character_names),
+            tuple(frozenset(world_objects[x].get_connections().items()) for x in self._room_names),
+            model.is_game_over())
+
+    # Returns key with the parts for names re-read from model, e.g. the names touched by one command
+    def update(self, key:tuple, model, names) -> tuple:
+        world_objects = model.get_world_objects()
+        states, positions, inventories, connections = [list(x) for x in key[:4]]
+        state_index, position_index, character_index, room_index = self._indices
+        relevance = self.__get_relevance(key[0])
+        rules, state_mask, position_mask, carried, room_mask = relevance
+        for name in names:
+            world_object = world_objects[name]
+            if name in state_index and state_mask[state_index[name]]:
+                states[state_index[name]] = to_key(world_object.get_current_state())
+            if name in position_index and position_mask[position_index[name]]:
+                positions[position_index[name]] = self.__get_position(world_object)
+            if name in character_index:
+                inventories[character_index[name]] = carried.intersection(world_object.get_inventory())
+            if name in room_index and room_mask[room_index[name]]:
+                connections[room_index[name]] = frozenset(world_object.get_connections().items())
+        states = tuple(states)
+        if self.__get_relevance(states) is not relevance:
+            # an object settled, so less of the world matters from here on
+            return self.__mask(states, positions, inventories, connections, model.is_game_over())
+        return (states, tuple(positions), tuple(inventories), tuple(connections), model.is_game_over())
+
+    # Returns the names whose parts differ between two keys, or None when the keys leave out different parts
+    # restore(key, model, names) rewinds a model at previous to key
+    def get_changed_names(self, previous:tuple, key:tuple):
+        if self.__get_relevance(previous[0]) is not self.__get_relevance(key[0]):
+            return None
+        names = set()
+        for part_names, old, new in zip((self._state_names, self._position_names, self._character_names, self._room_names),
+                                        previous[:4], key[:4]):
+            names.update(x for x,a,b in zip(part_names, old, new) if b is not None and a != b)
+        return names
+
+    # Rewinds model to key - every object, or only those in names when model only differs from key there
+    # whatever keys leave out is never read, so it is left to drift
+    def restore(self, key:tuple, model, names=None) -> None:
+        states, positions, inventories, connections, game_over = key
+        carried = self.__get_relevance(states)[3]
+        world_objects = model.get_world_objects()
+        characters = model.get_characters()
+        state_index, position_index, character_index, room_index = self._indices
+        names = list(world_objects.keys() if names is None else names)
+        for name in names:
+            state = states[state_index[name]] if name in state_index else None
+            if state is not None and to_key(world_objects[name].get_current_state()) != state:
+                model.set_object_state(name, from_key(state))
+        for name in names:
+            if name in character_index:
+                inventory = inventories[character_index[name]]
+                held = world_objects[name].get_inventory()
+                for item_name in [x for x in held if x in carried and x not in inventory]:
+                    model.remove_from_inventory(name, item_name)
+                for item_name in inventory:
+                    if item_name not in held:
+                        model.add_to_inventory(name, item_name)
+        # characters first - moving one also moves what it carries
+        for name in sorted(names, key=lambda x: x not in characters):
+            room_name = positions[position_index[name]] if name in position_index else None
+            if room_name is not None and world_objects[name].get_room_name() != room_name:
+                if name in characters:
+                    model.move_character(name, room_name)
+                else:
+                    world_objects[name].set_room_name(room_name)
+        for name in names:
+            passages = connections[room_index[name]] if name in room_index else None
+            if passages is not None and frozenset(world_objects[name].get_connections().items()) != passages:
+                model.reset_connections(name, dict(passages))
+        model.set_game_over(game_over)
+
+    # Returns the rules that can still influence a goal from key
+    def get_rules(self, key:tuple) -> list:
+        return self.__get_relevance(key[0])[0]
+
+    def get_state_index(self, name:str) -> int:
+        return self._state_names.index(name)
+
+# per-process state for the worker pool - one world per process, rewound to each state it expands
+_worker = {}
+
+def init_worker(file_names:tuple, parser_only:bool, goal_names=()) -> None:
+    assets = GameAssets(*load_game_data(*file_names))
+    model = GameModel(assets.get_data(), assets.get_action_rules())
+    _worker['codec'] = StateCodec(model, get_candidates(assets, parser_only), goal_names)
+    _worker['controller'] = GameController(model, None, assets.get_command_parser())
+    _worker['events'] = []
+    model.set_event_listener(_worker['events'].append)
+
+def get_candidates(assets, parser_only:bool) -> list:
+    # every (action, target) rule that can change the world, optionally only those a player could type
+    candidates = []
+    typed = set()
+    for mapped in assets.get_commands().values():
+        typed.update(mapped.split() if isinstance(mapped, str) else mapped)
+    for (action_name, target_name), rule in assets.get_action_rules().get_rules().items():
+        if action_name in PASSIVE_ACTIONS:
+            continue
+        if parser_only and (action_name not in typed or target_name not in typed):
+            continue
+        candidates.append(rule)
+    return candidates
+
+def expand(keys:list) -> list:
+    # [(key, [(command, successor key), ...], [(command, error), ...]), ...] for a chunk of the frontier
+    # commands that raise are engine or asset bugs - they are reported instead of ending the search
+    codec = _worker['codec']
+    ctrl = _worker['controller']
+    model = ctrl.get_model()
+    events = _worker['events']
+    world_objects = model.get_world_objects()
+    player = world_objects[model.get_player_name()]
+    results = []
+    previous = None
+    for key in keys:
+        # the model is left at the previous key, so often only a few objects need rewinding
+        codec.restore(key, model, None if previous is None else codec.get_changed_names(previous, key))
+        previous = key
+        successors = []
+        failures = []
+        for rule in codec.get_rules(key):
+            target = world_objects.get(rule.get_target_name())
+            if target is not None and target.get_room_name() != player.get_room_name() and rule.get_action_name() != 'move':
+                # the controller would refuse it too - actions need the player and their target in the same room
+                continue
+            del events[:]
+            command = f"{rule.get_action_name()} {rule.get_target_name()}"
+            try:
+                ctrl.perform_command(rule)
+            except Exception as e:
+                failures.append((command, f"{type(e).__name__}: {e}"))
+                codec.restore(key, model, get_event_names(events, model))
+                continue
+            names = get_event_names(events, model)
+            if len(names) == 0:
+                # at most descriptions were shown, so the world is unchanged
+                continue
+            next_key = codec.update(key, model, names)
+            if next_key != key:
+                successors.append((command, next_key))
+            # undo the command - only the objects it touched differ from key
+            codec.restore(key, model, names)
+        results.append((key, successors, failures))
+    return results
+
+def parse_goal(goal:str, model) -> tuple:
+    # (object name, state) - raises ValueError for goals that do not name a state of an object in the assets
+    if ':' not in goal:
+        raise ValueError(f"Goal '{goal}' should look like 'object:state'")
+    name, state = goal.rsplit(':', 1)
+    world_object = model.get_world_objects().get(name)
+    if world_object is None:
+        raise ValueError(f"Unknown object '{name}' in goal '{goal}'")
+    if not world_object.has_state(state):
+        raise ValueError(f"'{name}' has no state '{state}' (states: {', '.join(world_object.get_state_names())})")
+    return (name, state)
+
+def get_unproducible_goals(model, candidates:list, goals:list) -> list:
+    # goals that no rule ever sets (and that do not hold at the start) - unreachable without any search
+    produced = get_produced_states(model, candidates)
+    world_objects = model.get_world_objects()
+    return [(name, state) for name, state in goals
+            if state != world_objects[name].get_starting_state() and state not in produced.get(name, ())]
+
+def get_path(parents:dict, key:tuple) -> list:
+    path = []
+    while parents[key] is not None:
+        key, command = parents[key]
+        path.append(command)
+    path.reverse()
+    return path
+
+def solve(file_names:tuple, goals:list, workers:int=None, parser_only:bool=False, max_states:int=DEFAULT_MAX_STATES,
+          exhaustive:bool=False) -> dict:
+    # stops once every goal is reached (shortest paths are known by then), unless exhaustive - dead ends are
+    # only counted after a full search; max_states=None never stops early
+    # raises ValueError for a goal that is not 'object:state' of this asset pack
+    start_time = time.perf_counter()
+    assets = GameAssets(*load_game_data(*file_names))
+    model = GameModel(assets.get_data(), assets.get_action_rules())
+    parsed = {goal:parse_goal(goal, model) for goal in goals}
+    goal_names = tuple(name for name, state in parsed.values())
+    unproducible = get_unproducible_goals(model, get_candidates(assets, parser_only), list(parsed.values()))
+    report = {'goals' : {goal:None for goal in goals},
+              'unproducible' : [goal for goal, parsed_goal in parsed.items() if parsed_goal in unproducible]}
+    if len(report['unproducible']) == len(goals):
+        # nothing to search for - every goal is unreachable whatever the player does
+        report.update({'states' : 0, 'truncated' : False, 'complete' : False, 'searched' : False, 'failures' : {}, 'stuck_states' : None,
+                       'dead_end_states' : None, 'dead_end_examples' : [], 'seconds' : time.perf_counter() - start_time})
+        return report
+
+    init_worker(file_names, parser_only, goal_names)
+    codec = _worker['codec']
+    start_key = codec.encode(_worker['controller'].get_model())
+    goal_indices = [(goal, codec.get_state_index(name), state) for goal, (name, state) in parsed.items()
+                    if goal not in report['unproducible']]
+    unreached = {goal for goal, index, state in goal_indices if start_key[0][index] != state}
+
+    # breadth-first, one frontier level at a time, expanded in parallel and deduplicated here
+    parents = {start_key:None}
+    successors = {}
+    frontier = [start_key]
+    truncated = False
+    failures = {}
+    executor = None
+    worker_count = workers or os.cpu_count() or 1
+    if worker_count != 1:
+        executor = ProcessPoolExecutor(worker_count, initializer=init_worker, initargs=(file_names, parser_only, goal_names))
+    try:
+        while len(frontier) > 0 and (exhaustive or len(unreached) > 0):
+            if executor is None:
+                results = expand(frontier)
+            else:
+                chunk_size = max(1, len(frontier) // (worker_count * 4))
+                chunks = [frontier[i:i+chunk_size] for i in range(0, len(frontier), chunk_size)]
+                results = [x for chunk in executor.map(expand, chunks) for x in chunk]
+            frontier = []
+            for key, next_steps, key_failures in results:
+                for command, error in key_failures:
+                    failures.setdefault(command, (error, key))
+                successors[key] = set()
+                for command, next_key in next_steps:
+                    successors[key].add(next_key)
+                    if next_key not in parents:
+                        parents[next_key] = (key, command)
+                        frontier.append(next_key)
+                        unreached.difference_update([goal for goal, index, state in goal_indices if next_key[0][index] == state])
+            if max_states is not None and len(parents) >= max_states:
+                truncated = len(frontier) > 0
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # goals, then states that cannot reach any goal (backwards search from every goal state)
+    report.update({'states' : len(parents), 'truncated' : truncated, 'complete' : len(frontier) == 0, 'searched' : True,
+                   'failures' : {k:{'error' : v[0], 'after' : get_path(parents, v[1])} for k,v in failures.items()}})
+    goal_keys = set()
+    for goal, index, state in goal_indices:
+        reached = [k for k in parents if k[0][index] == state]
+        goal_keys.update(reached)
+        report['goals'][goal] = None if len(reached) == 0 else min((get_path(parents, k) for k in reached), key=len)
+    predecessors = {}
+    for key, next_keys in successors.items():
+        for next_key in next_keys:
+            predecessors.setdefault(next_key, []).append(key)
+    can_finish = set(goal_keys)
+    stack = list(goal_keys)
+    while len(stack) > 0:
+        for previous in predecessors.get(stack.pop(), []):
+            if previous not in can_finish:
+                can_finish.add(previous)
+                stack.append(previous)
+    stuck = [k for k in successors if len(successors[k]) == 0 and k not in goal_keys]
+    report['stuck_states'] = len(stuck)
+    if len(frontier) > 0:
+        # unexplored states may still lead to a goal, so dead ends are only known for a full search
+        report['dead_end_states'] = None
+        report['dead_end_examples'] = []
+    else:
+        doomed = [k for k in parents if k not in can_finish]
+        report['dead_end_states'] = len(doomed)
+        report['dead_end_examples'] = [get_path(parents, k) for k in sorted(doomed, key=lambda k: len(get_path(parents, k)))[:3]]
+    report['seconds'] = time.perf_counter() - start_time
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Check which endings of an asset pack can be reached.')
+    parser.add_argument('--assets', default='game_assets.json')
+    parser.add_argument('--commands', default='game_command_map.json')
+    parser.add_argument('--responses', default='game_responses.json')
+    parser.add_argument('--goal', action='append', help="'object:state' to reach, repeatable (default: the Room 9 endings)")
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU, 1 runs inline)')
+    parser.add_argument('--parser-only', action='store_true', help='only use (action, target) pairs a player can type')
+    parser.add_argument('--max-states', type=int, default=DEFAULT_MAX_STATES,
+        help=f'stop exploring after this many states, 0 for no limit (default: {DEFAULT_MAX_STATES})')
+    parser.add_argument('--exhaustive', action='store_true',
+        help='keep exploring after every goal is reached, to count the states from which none can be')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    try:
+        report = solve((args.assets, args.commands, args.responses), args.goal or DEFAULT_GOALS,
+            args.workers, args.parser_only, args.max_states or None, args.exhaustive)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    if report['searched']:
+        if report['truncated']:
+            note = " (stopped at --max-states, results are partial)"
+        elif not report['complete']:
+            note = " (stopped once every goal was reached, --exhaustive explores the rest)"
+        else:
+            note = ""
+        print(f"Explored {report['states']} states in {report['seconds']:.2f}s{note}")
+    else:
+        print("No search needed - no action rule sets any of the goal states")
+    for goal, path in report['goals'].items():
+        if goal in report['unproducible']:
+            print(f"UNREACHABLE {goal} (no action rule sets this state)")
+        elif path is None:
+            print(f"not reached {goal} within {report['states']} states (raise --max-states)" if report['truncated'] else f"UNREACHABLE {goal}")
+        else:
+            print(f"reachable   {goal} in {len(path)} commands: {', '.join(path)}")
+    for command, failure in report['failures'].items():
+        print(f"FAILS       {command} ({failure['error']}) after: {', '.join(failure['after']) or '(start)'}")
+    if report['stuck_states'] is not None:
+        print(f"{report['stuck_states']} states with no possible action")
+    if report['dead_end_states'] is not None:
+        print(f"{report['dead_end_states']} states from which no goal can be reached")
+    for path in report['dead_end_examples']:
+        print(f"  e.g. after: {', '.join(path) or '(start)'}")
+    if None in report['goals'].values():
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import json
+import re
+from types import MappingProxyType
+from game_assets import freeze_assets
+
+# Reads game_assets.json incrementally - each game object, room and action rule is decoded, frozen and
+# placed as soon as it arrives, so the file text and an unfrozen copy of the world are never held whole.
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+class JsonStream():
+
+    # Constructor - decodes JSON values from a text stream, reading chunk_size characters at a time
+    def __init__(self, stream, chunk_size:int=1<<16) -> None:
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._buffer = ''
+        self._position = 0
+        self._decoder = json.JSONDecoder()
+
+    def __fill(self, size:int) -> bool:
+        # appends the next chunk to whatever is left unread, returning False at the end of the stream
+        chunk = self._stream.read(size)
+        if not chunk:
+            return False
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+        return True
+
+    def __peek(self) -> str:
+        # the next non-whitespace character, without consuming it
+        while True:
+            self._position = WHITESPACE.match(self._buffer, self._position).end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self.__fill(self._chunk_size):
+                raise ValueError("Unexpected end of JSON")
+
+    def __expect(self, characters:str) -> str:
+        character = self.__peek()
+        if character not in characters:
+            raise ValueError(f"Expected one of {characters!r} at offset {self._position}, found {character!r}")
+        self._position += 1
+        return character
+
+    def read_value(self):
+        # decodes one whole value, reading further chunks (twice as many each time) until it is complete
+        self.__peek()
+        size = self._chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                if not self.__fill(size):
+                    raise
+                size *= 2
+                continue
+            if end == len(self._buffer) and self.__fill(size):
+                # a number at the end of the buffer may carry on in the next chunk
+                continue
+            self._position = end
+            return value
+
+    def read_end(self) -> None:
+        # raises ValueError unless only whitespace is left, as json.load would
+        while True:
+            self._position = WHITESPACE.match(self._buffer, self._position).end()
+            if self._position < len(self._buffer):
+                raise ValueError(f"Extra data at offset {self._position}")
+            if not self.__fill(self._chunk_size):
+                return
+
+    def iter_object(self):
+        # yields the keys of the next object - the caller reads each value (or iterates into it) before the next key
+        self.__expect('{')
+        if self.__peek() == '}':
+            self._position += 1
+            return
+        while True:
+            key = self.read_value()
+            if not isinstance(key, str):
+                raise ValueError(f"Expected an object key at offset {self._position}")
+            self.__expect(':')
+            yield key
+            if self.__expect(',}') == '}':
+                return
+
+def iter_asset_entries(stream):
+    # yields (path, value) for each game object, room and action rule field, e.g.
+    # (('world_objects', 'rooms', 'Room 1'), {...}) or (('actions', 'move', 'north'), {...})
+    # containers are announced with an empty dict first, so empty ones survive - and a repeated key
+    # starts its container over, so the last occurrence wins as it does with json.load
+    reader = JsonStream(stream)
+    for key in reader.iter_object():
+        if key in ['world_objects', 'actions']:
+            yield (key,), {}
+            for group in reader.iter_object():
+                yield (key, group), {}
+                for name in reader.iter_object():
+                    yield (key, group, name), reader.read_value()
+        else:
+            yield (key,), reader.read_value()
+    reader.read_end()
+
+def assemble_entries(entries):
+    # builds read-only data from (path, value) entries, freezing each value as it arrives
+    root = {}
+    for path, value in entries:
+        parent = root
+        for key in path[:-1]:
+            parent = parent.setdefault(key, {})
+        if isinstance(value, dict) and len(value) == 0:
+            parent[path[-1]] = {}
+        else:
+            parent[path[-1]] = freeze_assets(value)
+    return freeze_containers(root)
+
+def freeze_containers(container:dict):
+    # wraps the plain dicts made by assemble_entries in place - their values are frozen already
+    for key, value in container.items():
+        if type(value) is dict:
+            container[key] = freeze_containers(value)
+    return MappingProxyType(container)
+
+def stream_game_data(assets_file_name:str):
+    # the same read-only data GameAssets would make from json.load, without loading the file whole
+    with open(assets_file_name) as assets_file:
+        return assemble_entries(iter_asset_entries(assets_file))
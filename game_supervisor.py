@@ -0,0 +1,374 @@
+import argparse
+import contextlib
+import hashlib
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from multiprocessing.connection import wait
+from urllib.parse import unquote
+from game_assets import GameAssets
+from game_batch import read_script, report
+from game_bundle import load_game_data
+from game_reload import AssetWatcher, format_report
+from game_session import GameSessionManager, JOURNAL_SUFFIX
+from game_sink import BufferSink
+
+# Runs game sessions across worker processes so play is not limited to one interpreter.
+# Each session lives on the worker its id hashes to (rendezvous hashing), so when a worker dies only
+# its own sessions move - and with a journal_dir they are recovered from their journals.
+
+# run_commands sends each worker its commands in batches, with at most two batches outstanding -
+# small enough that the request pipe never fills up while the worker is busy writing replies
+BATCH_SIZE = 128
+BATCHES_IN_FLIGHT = 2
+
+def run_worker(file_names:tuple, journal_dir:str, connection, reload_interval:float=None) -> None:
+    # worker process main loop - one GameSessionManager, requests answered in the order they arrive
+    # with a reload_interval, the worker hot-reloads its sessions whenever the asset files change
+    manager = GameSessionManager(GameAssets(*load_game_data(*file_names)), headless=True, journal_dir=journal_dir)
+    watcher = None
+    if reload_interval is not None:
+        watcher = AssetWatcher(manager, file_names, reload_interval, lambda report, dropped:
+            print(f"{multiprocessing.current_process().name} reloaded assets\n{format_report(report, dropped)}", file=sys.stderr))
+        watcher.start()
+    try:
+        while True:
+            try:
+                request = connection.recv()
+            except EOFError:
+                break
+            if request[0] == 'stop':
+                break
+            if request[0] == 'batch':
+                connection.send([try_request(manager, x) for x in request[1]])
+            else:
+                connection.send(try_request(manager, request))
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        manager.close()
+
+def try_request(manager, request:tuple) -> tuple:
+    # ('ok', result) or ('error', exception type, message) - errors go back to the supervisor
+    try:
+        return ('ok', handle_request(manager, request))
+    except Exception as e:
+        return ('error', type(e).__name__, str(e))
+
+def handle_request(manager, request:tuple):
+    op = request[0]
+    if op == 'create':
+        return manager.create_session(request[1], BufferSink()).get_session_id()
+    elif op == 'parse':
+        session_id, command = request[1:]
+        session = manager.get_session(session_id)
+        if session is None:
+            raise KeyError(f"Session '{session_id}' does not exist")
+        response = session.run_command(command)
+        if session.get_journal() is not None:
+            # a crashed worker then loses nothing a finished command changed
+            session.get_journal().flush()
+        return (response, session.get_view().get_sink().read(), session.get_controller().is_game_over())
+    elif op == 'destroy':
+        return manager.destroy_session(request[1], request[2]) is not None
+    raise ValueError(f"Unknown request '{op}'")
+
+def get_weight(slot:int, session_id:str) -> int:
+    # rendezvous hashing - a session belongs to the live slot with the highest weight for it
+    return int.from_bytes(hashlib.blake2b(f"{slot}:{session_id}".encode(), digest_size=8).digest(), 'big')
+
+
+
+
+
+class SessionWorker():
+
+    # Constructor - one worker process and the pipe to it; requests on the pipe are serialised by a lock
+    def __init__(self, slot:int, file_names:tuple, journal_dir:str, reload_interval:float=None) -> None:
+        self._slot = slot
+        self._file_names = file_names
+        self._journal_dir = journal_dir
+        self._reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._process = None
+        self._connection = None
+
+    def start(self) -> None:
+        parent_connection, child_connection = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=run_worker, daemon=True,
+            args=(self._file_names, self._journal_dir, child_connection, self._reload_interval), name=f"game-worker-{self._slot}")
+        self._process.start()
+        child_connection.close()
+        self._connection = parent_connection
+
+    def stop(self, timeout:float=5) -> None:
+        try:
+            self._connection.send(('stop',))
+        except (OSError, ValueError):
+            pass
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        self._connection.close()
+
+    def send(self, request:tuple) -> None:
+        self._connection.send(request)
+
+    def receive(self):
+        # returns the result of the oldest outstanding request, raising what the worker raised
+        return self.unpack(self._connection.recv())
+
+    def receive_batch(self) -> list:
+        # results of the oldest outstanding batch - exceptions are returned in place of failed results
+        results = []
+        for reply in self._connection.recv():
+            try:
+                results.append(self.unpack(reply))
+            except (KeyError, RuntimeError) as e:
+                results.append(e)
+        return results
+
+    def unpack(self, reply:tuple):
+        if reply[0] == 'error':
+            if reply[1] == 'KeyError':
+                raise KeyError(reply[2])
+            raise RuntimeError(f"{reply[1]} in worker {self._slot}: {reply[2]}")
+        return reply[1]
+
+    def request(self, request:tuple):
+        with self._lock:
+            self.send(request)
+            return self.receive()
+
+    # Getter Methods
+    def get_slot(self) -> int:
+        return self._slot
+
+    def get_lock(self):
+        return self._lock
+
+    def get_connection(self):
+        return self._connection
+
+    def get_pid(self) -> int:
+        return self._process.pid
+
+    def is_alive(self) -> bool:
+        return self._process.is_alive()
+
+
+
+
+
+class GameSupervisor():
+
+    # Constructor - starts worker_count workers (one per CPU by default), each loading the assets itself
+    # with restart, a dead worker is replaced in the same slot; without, its sessions move to the others
+    # with a reload_interval (seconds), workers hot-reload changed asset files into their live sessions
+    def __init__(self, file_names:tuple, worker_count:int=None, journal_dir:str=None, restart:bool=True,
+                 reload_interval:float=None) -> None:
+        self._file_names = file_names
+        self._journal_dir = journal_dir
+        self._reload_interval = reload_interval
+        self._restart = restart
+        self._workers = {}
+        self._sessions = {}
+        self._lock = threading.Lock()
+        for slot in range(worker_count or os.cpu_count() or 1):
+            self._workers[slot] = SessionWorker(slot, file_names, journal_dir, reload_interval)
+            self._workers[slot].start()
+
+    def get_owner(self, session_id:str) -> int:
+        # the slot of the live worker that owns session_id
+        if len(self._workers) == 0:
+            raise RuntimeError("No game workers left")
+        return max(self._workers, key=lambda slot: get_weight(slot, session_id))
+
+    def __get_session_worker(self, session_id:str):
+        if session_id not in self._sessions:
+            raise KeyError(f"Session '{session_id}' does not exist")
+        return self._workers[self._sessions[session_id]]
+
+    def create_session(self, session_id:str=None) -> str:
+        # an id with an existing journal resumes that game where it left off
+        if session_id is None:
+            session_id = uuid.uuid4().hex
+        with self._lock:
+            if session_id in self._sessions:
+                raise KeyError(f"Session '{session_id}' already exists")
+            slot = self.get_owner(session_id)
+            self._sessions[session_id] = slot
+        try:
+            self.__call(self._workers[slot], ('create', session_id))
+        except Exception:
+            with self._lock:
+                self._sessions.pop(session_id, None)
+            raise
+        return session_id
+
+    def recover_sessions(self) -> list:
+        # starts every journaled session in journal_dir that is not already running, returning their ids
+        recovered = []
+        if self._journal_dir is None or not os.path.isdir(self._journal_dir):
+            return recovered
+        for file_name in sorted(os.listdir(self._journal_dir)):
+            if file_name.endswith(JOURNAL_SUFFIX):
+                session_id = unquote(file_name[:-len(JOURNAL_SUFFIX)])
+                if session_id not in self._sessions:
+                    recovered.append(self.create_session(session_id))
+        return recovered
+
+    def destroy_session(self, session_id:str, keep_journal:bool=False) -> bool:
+        worker = self.__get_session_worker(session_id)
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        return self.__call(worker, ('destroy', session_id, keep_journal))
+
+    # Runs one command, returning (response code, rendered text, game over)
+    def try_parse(self, session_id:str, command:str) -> tuple:
+        return self.__call(self.__get_session_worker(session_id), ('parse', session_id, command))
+
+    # Runs many (session id, command) pairs, each session's commands in order, all workers at once
+    # returns one (response code, rendered text, game over) per pair, in the same order
+    def run_commands(self, commands:list) -> list:
+        results = [None] * len(commands)
+        queues = {}
+        for index, (session_id, command) in enumerate(commands):
+            slot = self.__get_session_worker(session_id).get_slot()
+            queues.setdefault(slot, deque()).append((index, ('parse', session_id, command)))
+        workers = [self._workers[x] for x in sorted(queues)]
+        failures = []
+        with contextlib.ExitStack() as stack:
+            # locks are always taken in slot order, so concurrent batches cannot deadlock
+            for worker in workers:
+                stack.enter_context(worker.get_lock())
+            in_flight = {x.get_slot():deque() for x in workers}
+            live = {x.get_connection():x for x in workers}
+            while len(live) > 0:
+                for connection, worker in list(live.items()):
+                    queue, pending = queues[worker.get_slot()], in_flight[worker.get_slot()]
+                    try:
+                        while len(queue) > 0 and len(pending) < BATCHES_IN_FLIGHT:
+                            batch = [queue.popleft() for x in range(min(BATCH_SIZE, len(queue)))]
+                            pending.append([x for x,y in batch])
+                            worker.send(('batch', [y for x,y in batch]))
+                    except (OSError, ValueError):
+                        failures.append(worker)
+                        del live[connection]
+                for connection in wait([x for x in live if len(in_flight[live[x].get_slot()]) > 0]):
+                    worker = live[connection]
+                    indices = in_flight[worker.get_slot()].popleft()
+                    try:
+                        for index, result in zip(indices, worker.receive_batch()):
+                            results[index] = result
+                    except (EOFError, OSError):
+                        failures.append(worker)
+                        del live[connection]
+                        continue
+                    if len(queues[worker.get_slot()]) == 0 and len(in_flight[worker.get_slot()]) == 0:
+                        del live[connection]
+        for worker in failures:
+            self.__replace_worker(worker)
+        if len(failures) > 0:
+            raise RuntimeError(f"Game worker(s) {', '.join(str(x.get_slot()) for x in failures)} died - "
+                f"unfinished commands were not run")
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def __call(self, worker, request:tuple):
+        # a request to one worker - if the worker has died it is replaced, and the request is not retried
+        try:
+            return worker.request(request)
+        except (EOFError, OSError):
+            self.__replace_worker(worker)
+            raise RuntimeError(f"Game worker {worker.get_slot()} died - '{request[0]}' was not run")
+
+    def check_workers(self) -> list:
+        # replaces any worker that has died since the last check, returning their slots
+        dead = [x for x in list(self._workers.values()) if not x.is_alive()]
+        for worker in dead:
+            self.__replace_worker(worker)
+        return [x.get_slot() for x in dead]
+
+    def __replace_worker(self, worker) -> None:
+        # restarts the slot, or drops it so rendezvous hashing hands its sessions to the remaining workers
+        slot = worker.get_slot()
+        with self._lock:
+            if self._workers.get(slot) is not worker:
+                # already replaced by another caller
+                return
+            worker.stop(timeout=0)
+            if self._restart:
+                self._workers[slot] = SessionWorker(slot, self._file_names, self._journal_dir, self._reload_interval)
+                self._workers[slot].start()
+            else:
+                del self._workers[slot]
+            orphans = [k for k,v in self._sessions.items() if v == slot]
+            for session_id in orphans:
+                del self._sessions[session_id]
+        if self._journal_dir is None:
+            # without journals the sessions of a dead worker are gone
+            return
+        for session_id in orphans:
+            self.create_session(session_id)
+
+    def close(self) -> None:
+        # stops every worker - journaled sessions are flushed and kept
+        for worker in list(self._workers.values()):
+            worker.stop()
+        self._workers.clear()
+        self._sessions.clear()
+
+    # Getter Methods
+    def get_session_ids(self) -> list:
+        return list(self._sessions.keys())
+
+    def get_session_count(self) -> int:
+        return len(self._sessions)
+
+    def get_worker_count(self) -> int:
+        return len(self._workers)
+
+    def get_worker_pids(self) -> dict:
+        return {slot:x.get_pid() for slot,x in self._workers.items()}
+
+    def get_session_counts(self) -> dict:
+        # sessions per worker slot
+        counts = {x:0 for x in self._workers}
+        for slot in self._sessions.values():
+            counts[slot] = counts.get(slot, 0) + 1
+        return counts
+
+def main():
+    parser = argparse.ArgumentParser(description='Play a command script in many sessions across worker processes.')
+    parser.add_argument('script', help="commands to play, one per line ('-' for stdin)")
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--sessions', type=int, default=100, help='concurrent sessions')
+    parser.add_argument('--assets', default='game_assets.json')
+    parser.add_argument('--commands', default='game_command_map.json')
+    parser.add_argument('--responses', default='game_responses.json')
+    args = parser.parse_args()
+
+    script = read_script(args.script)
+    # build (or refresh) the bundle once, before the workers all try to
+    load_game_data(args.assets, args.commands, args.responses)
+    supervisor = GameSupervisor((args.assets, args.commands, args.responses), args.workers)
+    try:
+        session_ids = [supervisor.create_session() for x in range(args.sessions)]
+        start = time.perf_counter()
+        # one round per script line, every session playing it at once
+        for command in script:
+            supervisor.run_commands([(x, command) for x in session_ids])
+        report(len(script) * len(session_ids), time.perf_counter() - start)
+    finally:
+        supervisor.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+import hashlib
+import mmap
+import os
+
+# Descriptions compiled out of the asset data into one block of UTF-8 text inside the bundle,
+# read back through mmap so prose is only paged in when it is shown - the compiled data keeps
+# (offset, length) pairs instead of the strings.
+
+class TextStore():
+
+    # Constructor - maps an open binary file read-only, text offsets are relative to base_offset
+    # the mapping outlives the file object, and survives the file being replaced on disk
+    def __init__(self, text_file, base_offset:int=0) -> None:
+        self._file_name = text_file.name
+        self._base_offset = base_offset
+        size = os.fstat(text_file.fileno()).st_size
+        # an empty file cannot be mapped, and has nothing to read anyway
+        self._text = mmap.mmap(text_file.fileno(), 0, access=mmap.ACCESS_READ) if size > 0 else b''
+
+    def get_text(self, offset:int, length:int) -> str:
+        start = self._base_offset + offset
+        return self._text[start:start+length].decode('utf-8')
+
+    def get_file_name(self) -> str:
+        return self._file_name
+
+    def get_size(self) -> int:
+        return len(self._text) - self._base_offset
+
+
+
+
+
+class TextRef():
+    __slots__ = ('_store', '_offset', '_length')
+
+    # Constructor - a description still in the TextStore, resolved each time it is shown
+    def __init__(self, store, offset:int, length:int) -> None:
+        self._store = store
+        self._offset = offset
+        self._length = length
+
+    def get_text(self) -> str:
+        return self._store.get_text(self._offset, self._length)
+
+    def __str__(self) -> str:
+        return self.get_text()
+
+
+
+
+
+class TextCompiler():
+
+    # Constructor - collects the text block for a bundle, one world object at a time
+    def __init__(self) -> None:
+        self._text = bytearray()
+        # digest -> (offset, length), so identical strings share one copy without keeping the strings
+        self._offsets = {}
+
+    # Replaces the description strings of one world object with (offset, length) pairs into the block
+    def compile(self, world_object:dict) -> None:
+        for description in get_descriptions(world_object):
+            for length_name, value in description.items():
+                if isinstance(value, str):
+                    encoded = value.encode('utf-8')
+                    digest = hashlib.blake2b(encoded, digest_size=16).digest()
+                    if digest not in self._offsets:
+                        self._offsets[digest] = (len(self._text), len(encoded))
+                        self._text += encoded
+                    description[length_name] = self._offsets[digest]
+
+    def get_text(self) -> bytes:
+        return bytes(self._text)
+
+def get_descriptions(world_object:dict):
+    # yields every {'long':..., 'short':...} description dict of a game object or room
+    for state in world_object.get('state', {}).values():
+        if isinstance(state, dict) and isinstance(state.get('description'), dict):
+            yield state['description']
+
+def attach_text_store(world_object:dict, store) -> None:
+    # replaces the (offset, length) pairs left by TextCompiler with TextRefs into store
+    for description in get_descriptions(world_object):
+        for length_name, value in description.items():
+            if isinstance(value, tuple):
+                description[length_name] = TextRef(store, *value)
+
+def resolve_text(value):
+    # descriptions may be plain strings or TextRefs
+    return value.get_text() if isinstance(value, TextRef) else value
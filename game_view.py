@@ -1,54 +1,196 @@
-import os
-import time
+import asyncio
+import threading
+from game_sink import StreamSink
+
+# cursor home, clear the screen, then clear the scrollback - what 'clear' does on most terminals
+CLEAR_SCREEN = '\x1b[H\x1b[2J\x1b[3J'
+
+# Joins words into an English list - 'a', 'a and b', 'a, b and c'
+def join_words(words, conjunction:str='and') -> str:
+	words = list(words)
+	if len(words) < 2:
+		return ''.join(words)
+	return f"{', '.join(words[:-1])} {conjunction} {words[-1]}"
+
+class Typewriter():
+
+	# Constructor - renders text a few characters per frame instead of one write and sleep per character
+	def __init__(self, text:str, stream=None, chars_per_second:int=100, frames_per_second:int=30) -> None:
+		self._text = text
+		self._stream = stream if stream is not None else StreamSink()
+		self._position = 0
+		self._frame_seconds = 1 / frames_per_second
+		self._chars_per_frame = max(1, round(chars_per_second / frames_per_second))
+		self._lock = threading.Lock()
+		self._stopped = threading.Event()
+		self._thread = None
+		self._task = None
+
+	def is_done(self) -> bool:
+		return self._stopped.is_set()
+
+	# Writes the next frame; returns False once the whole text has been written or rendering was stopped
+	def write_frame(self) -> bool:
+		with self._lock:
+			if self._stopped.is_set():
+				return False
+			end = self._position + self._chars_per_frame
+			self.__write(self._text[self._position:end])
+			self._position = end
+			if self._position >= len(self._text):
+				self._stopped.set()
+				return False
+			return True
+
+	# Writes everything that is left immediately
+	def skip(self) -> None:
+		with self._lock:
+			if not self._stopped.is_set():
+				self.__write(self._text[self._position:])
+				self._position = len(self._text)
+				self._stopped.set()
+		self.__cancel_task()
+
+	# Stops rendering, leaving the rest of the text unwritten
+	def cancel(self) -> None:
+		with self._lock:
+			self._stopped.set()
+		self.__cancel_task()
+
+	def __cancel_task(self) -> None:
+		# wakes the asyncio task from its sleep instead of leaving it to find out on the next frame
+		if self._task is None or self._task.done():
+			return
+		loop = self._task.get_loop()
+		try:
+			if asyncio.get_running_loop() is loop:
+				self._task.cancel()
+				return
+		except RuntimeError:
+			pass
+		try:
+			loop.call_soon_threadsafe(self._task.cancel)
+		except RuntimeError:
+			# the loop is already closed
+			pass
+
+	def __write(self, chunk:str) -> None:
+		self._stream.write(chunk)
+		self._stream.flush()
+
+	# Drives the frames from an asyncio event loop
+	async def run_async(self) -> None:
+		while self.write_frame():
+			await asyncio.sleep(self._frame_seconds)
+
+	# Starts run_async as a task on the running loop - the task is kept here, since the loop itself
+	# only holds a weak reference to it
+	def start_async(self):
+		self._task = asyncio.get_running_loop().create_task(self.run_async())
+		return self._task
+
+	def get_task(self):
+		return self._task
+
+	# Drives the frames from a background timer thread
+	def start(self) -> None:
+		self._thread = threading.Thread(target=self.__run_timer, daemon=True)
+		self._thread.start()
+
+	def __run_timer(self) -> None:
+		# waiting on the stop event lets skip/cancel wake the timer straight away
+		while self.write_frame():
+			self._stopped.wait(self._frame_seconds)
+
+	# Blocks the calling thread until rendering finishes, e.g. before prompting for input
+	def wait(self, timeout:float=None) -> None:
+		self._stopped.wait(timeout)
+		if self._thread is not None and self._stopped.is_set():
+			self._thread.join(timeout)
+
+
+
+
 
 class GameView():
-	_instance = None
-
-	@staticmethod
-	def get_instance(commands, responses):
-		# Used to enforce Singleton
-		if GameView._instance is None:
-			GameView(commands, responses)
-		return GameView._instance
-
-	# Constructor
-	def __init__(self, commands, responses) -> None:
-		if GameView._instance is not None:
-			raise Exception("This class is a Singleton")
-		else:
-			GameView._instance = self
-			self._commands = commands
-			self._responses = responses
 
+	# Constructor - one instance per game session; headless views print slow text immediately
+	# output goes to sink (stdout by default), flushed once per response
+	def __init__(self, commands, responses, headless:bool=False, sink=None) -> None:
+		self._commands = commands
+		self._responses = responses
+		self._headless = headless
+		self._sink = sink if sink is not None else StreamSink()
+		self._typewriter = None
+
+	# Clears the terminal in-process with escape sequences - does nothing for files, sockets and pipes
 	def clear_screen(self):
-		os.system('cls') # for windows
-		os.system('clear') # for unix/mac
+		self.skip_output()
+		if self._sink.supports_ansi():
+			self._sink.write(CLEAR_SCREEN)
+			self._sink.flush()
+
+	def __output(self, lines) -> None:
+		# one write per response, whatever the number of lines
+		self.skip_output()
+		self._sink.write(''.join(f"{x}\n" for x in lines))
+		self._sink.flush()
 
 	def print_help_commands(self, available_actions):
-		print(self._responses.get('help'))
-		for action in sorted(available_actions):
-			print(f"- {action}")
+		self.__output([self._responses.get('help')] + [f"- {action}" for action in sorted(available_actions)])
 
 	def print_inventory(self, inventory = []):
 		if len(inventory) == 0:
-			print(self._responses.get('inventory'),get("=0"))
+			self.__output([self._responses.get('inventory').get("=0")])
 		else:
-			print(self._responses.get('inventory'),get(">0"))
-			for item in inventory:
-				print(f"- {item}")
+			self.__output([self._responses.get('inventory').get(">0")] + [f"- {item}" for item in inventory])
 
 	def print_error(self, error_message):
-		print(self._responses.get(error_message))
+		self.__output([self._responses.get(error_message)])
 
 	def print_message_immediate(self, immediate_text):
-		print(self._responses.get(immediate_text))
+		self.__output([self._responses.get(immediate_text)])
 
+	# Starts a typewriter effect without blocking and returns it, so the caller can skip or cancel it
 	def print_message_slow(self, slow_text):
-		print("\n")
-		for c in slow_text:
-			print(c,end='',flush=True)
-			time.sleep(0.01)
-		print('')
+		self.skip_output()
+		text = f"\n\n{slow_text}\n"
+		if self._headless:
+			self._sink.write(text)
+			self._sink.flush()
+			return None
+		self._typewriter = Typewriter(text, self._sink)
+		try:
+			self._typewriter.start_async()
+		except RuntimeError:
+			# no event loop in this thread - fall back to a timer thread
+			self._typewriter.start()
+		return self._typewriter
+
+	# Finishes any typewriter output still in progress immediately
+	def skip_output(self) -> None:
+		if self._typewriter is not None:
+			self._typewriter.skip()
+			self._typewriter = None
+
+	def cancel_output(self) -> None:
+		if self._typewriter is not None:
+			self._typewriter.cancel()
+			self._typewriter = None
+
+	def wait_output(self) -> None:
+		if self._typewriter is not None:
+			self._typewriter.wait()
+
+	def is_headless(self) -> bool:
+		return self._headless
+
+	def get_sink(self):
+		return self._sink
+
+	def set_sink(self, sink) -> None:
+		self.skip_output()
+		self._sink = sink
 
 	def get_command_map(self) -> dict:
 		return self._commands
@@ -1,5 +1,11 @@
 # import classes
-import json
+import argparse
+import sys
+from game_assets import GameAssets
+from game_batch import read_script, run_batch, report
+from game_bundle import load_game_data
+from game_metrics import LatencyRecorder
+from game_session import GameSessionManager
 from game_model import *
 from game_view import * 
 from game_controller import *
@@ -9,16 +15,43 @@ assets_file_name = 'game_assets.json'
 commands_file_name = 'game_command_map.json'
 responses_file_name = 'game_responses.json'
 
+def wait_for_output(ctrl):
+	# let the typewriter finish before prompting - Ctrl+C skips to the end of the text
+	try:
+		ctrl.wait_for_output()
+	except KeyboardInterrupt:
+		ctrl.skip_output()
+
+def run_headless(args, data, commands, responses):
+	# headless batch mode - no typewriter, no screen clears, just commands through try_parse
+	latency_recorder = LatencyRecorder() if args.latency else None
+	manager = GameSessionManager(GameAssets(data, commands, responses), headless=True, latency_recorder=latency_recorder)
+	script = read_script(args.script)
+	if args.transcript is None:
+		total, elapsed = run_batch(manager, script, args.repeat)
+	elif args.transcript == '-':
+		total, elapsed = run_batch(manager, script, args.repeat, sys.stdout)
+	else:
+		with open(args.transcript, 'w') as transcript_file:
+			total, elapsed = run_batch(manager, script, args.repeat, transcript_file)
+	report(total, elapsed)
+	if latency_recorder is not None:
+		latency_recorder.dump(sys.stderr)
+
 def main():
-	### Load Game Assets and Commands
-	with open(assets_file_name) as json_file:
-	    data = json.load(json_file)
+	parser = argparse.ArgumentParser(description='The Circles - a text adventure game.')
+	parser.add_argument('--script', help="run commands from a file ('-' for stdin) without the interactive prompt")
+	parser.add_argument('--transcript', help="with --script, write the game output to this file ('-' for stdout)")
+	parser.add_argument('--latency', action='store_true', help='with --script, print per-action stage latency histograms to stderr')
+	parser.add_argument('--repeat', type=int, default=1, help='with --script, play the script this many times in fresh games')
+	args = parser.parse_args()
 
-	with open(commands_file_name) as json_file:
-	    commands = json.load(json_file)
+	### Load Game Assets and Commands (from the compiled bundle when it is up to date)
+	data, commands, responses = load_game_data(assets_file_name, commands_file_name, responses_file_name)
 
-	with open(responses_file_name) as json_file:
-	    responses = json.load(json_file)
+	if args.script is not None:
+		run_headless(args, data, commands, responses)
+		return
 
 	### Initialize World
 	ctrl = GameController(GameModel(data), GameView(commands, responses))
@@ -30,6 +63,7 @@ def main():
 
 	while(True):
 		# accept commands in a permenent while loop
+		wait_for_output(ctrl)
 		cmd_input = input("\n>>> ")
 		if ctrl.is_exit_command(cmd_input):
 			break
@@ -42,6 +76,7 @@ def main():
 			break
 
 	# output gameover screen
+	wait_for_output(ctrl)
 	ctrl.print_response('game over')
 
 if __name__ == '__main__':